@@ -0,0 +1,84 @@
+import asyncio
+import time
+from contextvars import Context, ContextVar
+from typing import Mapping
+from app.core.config import settings
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(headers: Mapping[str, str]) -> Deadline:
+    """Start the request budget from the X-Request-Timeout header (seconds) or the default."""
+    seconds = settings.REQUEST_DEADLINE_SECONDS
+    raw = headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            seconds = float(raw)
+        except ValueError:
+            pass
+    seconds = max(0.0, min(seconds, settings.REQUEST_DEADLINE_MAX_SECONDS))
+    deadline = Deadline(seconds)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+def stage_timeout(cap: float | None = None) -> float | None:
+    """Timeout for the next stage: the remaining budget, clipped to the stage's own cap."""
+    deadline = current_deadline()
+    if deadline is None:
+        return cap
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded(f"request deadline of {deadline.seconds:.1f}s exceeded")
+    return remaining if cap is None else min(cap, remaining)
+
+
+async def with_deadline(awaitable, cap: float | None = None):
+    try:
+        timeout = stage_timeout(cap)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"request deadline of {deadline.seconds:.1f}s exceeded")
+        raise
+
+
+def create_task_with_deadline(coro, seconds: float) -> asyncio.Task:
+    """Run `coro` as a task with its own budget instead of the caller's.
+
+    The task starts from an empty context, so it does not inherit the deadline (or
+    anything else) of whichever request happened to create it.
+    """
+    context = Context()
+    context.run(_current_deadline.set, Deadline(seconds))
+    return context.run(asyncio.create_task, coro)
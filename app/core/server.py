@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Dict
+import uvicorn
+from uvicorn.importer import import_from_string
+from app.core.config import settings
+
+# Restart backoff for crashed workers: doubles per crash up to the max, and the crash
+# count starts over once no worker has crashed for RESTART_QUIET_SECONDS
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 30.0
+RESTART_QUIET_SECONDS = 60.0
+
+
+class _WorkerServer(uvicorn.Server):
+    """Sets `started` once the app's startup hook ran and the socket is serving."""
+
+    def __init__(self, config: uvicorn.Config, started):
+        super().__init__(config)
+        self.started_event = started
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            self.started_event.set()
+
+
+def _bind_socket(reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ':' in settings.WEB_HOST else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((settings.WEB_HOST, settings.WEB_PORT))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(app, sock: socket.socket | None, started):
+    if sock is None:
+        # SO_REUSEPORT mode: every worker owns a listening socket on the same port
+        sock = _bind_socket(reuse_port=True)
+    config = uvicorn.Config(app, host=settings.WEB_HOST, port=settings.WEB_PORT, proxy_headers=True)
+    _WorkerServer(config, started).run(sockets=[sock])
+
+
+def run_production(app_path: str = "main:app"):
+    """Run the API with WEB_WORKERS processes under a small supervisor.
+
+    With WEB_PRELOAD the app is imported once here and workers are forked from it;
+    nothing opens a connection at import time, so pools are created per worker in
+    the startup hook. Workers that crash are restarted with exponential backoff, up
+    to WEB_MAX_RESTARTS in a row; a worker that dies before it ever served stops the
+    whole server, since its replacement would fail the same way.
+    """
+    workers = max(1, settings.WEB_WORKERS)
+    if workers == 1 and not settings.WEB_REUSE_PORT:
+        uvicorn.run(app_path, host=settings.WEB_HOST, port=settings.WEB_PORT, proxy_headers=True)
+        return
+
+    if not hasattr(os, "fork"):
+        # No fork (Windows): fall back to uvicorn's own spawn-based supervisor
+        uvicorn.run(app_path, host=settings.WEB_HOST, port=settings.WEB_PORT, workers=workers, proxy_headers=True)
+        return
+
+    app = import_from_string(app_path) if settings.WEB_PRELOAD else app_path
+    shared_sock = None if settings.WEB_REUSE_PORT else _bind_socket(reuse_port=False)
+    ctx = multiprocessing.get_context("fork")
+
+    def start_worker():
+        started = ctx.Event()
+        process = ctx.Process(target=_serve, args=(app, shared_sock, started), daemon=False)
+        process.start()
+        return process, started
+
+    procs = [start_worker() for _ in range(workers)]
+    print(f"Started {workers} workers (reuse_port={settings.WEB_REUSE_PORT}, preload={settings.WEB_PRELOAD})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    crashes = 0
+    last_crash = 0.0
+    # Slot index -> monotonic time at which its replacement worker is started
+    pending: Dict[int, float] = {}
+
+    while not stopping:
+        now = time.monotonic()
+        for i, (process, started) in enumerate(procs):
+            if i in pending or process.is_alive():
+                continue
+            if not started.is_set():
+                # Died before serving (bad config, unreachable dependency, import error):
+                # a restart would fail the same way
+                print(f"Worker {process.pid} exited with {process.exitcode} before serving, shutting down")
+                stopping = True
+                break
+            if now - last_crash > RESTART_QUIET_SECONDS:
+                crashes = 0
+            crashes += 1
+            last_crash = now
+            if settings.WEB_MAX_RESTARTS and crashes > settings.WEB_MAX_RESTARTS:
+                print(f"Workers crashed {crashes} times in a row, shutting down")
+                stopping = True
+                break
+            delay = min(RESTART_BACKOFF_MAX_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** (crashes - 1))
+            print(f"Worker {process.pid} exited with {process.exitcode}, restarting in {delay:.1f}s")
+            pending[i] = now + delay
+
+        for i, restart_at in list(pending.items()):
+            if not stopping and restart_at <= time.monotonic():
+                del pending[i]
+                procs[i] = start_worker()
+        time.sleep(0.5)
+
+    for process, _ in procs:
+        if process.is_alive():
+            process.terminate()
+    for process, _ in procs:
+        process.join()
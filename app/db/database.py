@@ -6,18 +6,48 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-)
+
+def make_engine(url: str):
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        # Size of the per-connection prepared statement cache; set DB_STATEMENT_CACHE_SIZE=0
+        # behind pgbouncer in transaction mode
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+
+
+engine = make_engine(settings.DATABASE_URL)
+# Lookups go to the read replica when one is configured, otherwise to the primary
+read_engine = make_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else engine
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
     expire_on_commit=False,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+        yield session
+
+def is_replica_session(session: AsyncSession) -> bool:
+    return read_engine is not engine and session.bind is read_engine
@@ -0,0 +1,166 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from pydantic import BaseModel, model_validator
+from pydantic_core import core_schema
+
+
+class KLinePoint(BaseModel):
+    age: int
+    year: int
+    ganZhi: str
+    superLuck: Optional[str] = None
+    open: float
+    close: float
+    high: float
+    low: float
+    score: float
+    reason: str
+
+
+class ChartColumns(BaseModel):
+    age: List[int]
+    year: List[int]
+    ganZhi: List[str]
+    superLuck: List[Optional[str]]
+    open: List[float]
+    close: List[float]
+    high: List[float]
+    low: List[float]
+    score: List[float]
+    reason: List[str]
+
+    @model_validator(mode='after')
+    def check_lengths(self):
+        lengths = {len(v) for v in self.__dict__.values()}
+        if len(lengths) > 1:
+            raise ValueError('chart columns must all have the same length')
+        return self
+
+
+NUMERIC_INT_FIELDS = ('age', 'year')
+NUMERIC_FLOAT_FIELDS = ('open', 'close', 'high', 'low', 'score')
+STRING_FIELDS = ('ganZhi', 'superLuck', 'reason')
+ROW_FIELDS = ('age', 'year', 'ganZhi', 'superLuck', 'open', 'close', 'high', 'low', 'score', 'reason')
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # ganZhi/superLuck only take 60 distinct values and reason strings repeat a lot,
+    # so every column shares a single copy of each string.
+    if value is None:
+        return None
+    return sys.intern(str(value))
+
+
+class ChartSeries:
+    """Columnar (struct-of-arrays) storage for K-line chart points.
+
+    Numeric columns are backed by `array` so 100 points cost a few hundred bytes
+    instead of 100 pydantic instances with their own field dicts. This is what
+    `LifeDestinyResult.chartData` holds; rows are only built when the default
+    `chartData` response is serialized, or on indexing/iteration.
+    """
+
+    __slots__ = NUMERIC_INT_FIELDS + NUMERIC_FLOAT_FIELDS + STRING_FIELDS
+
+    def __init__(self):
+        self.age = array('i')
+        self.year = array('i')
+        self.open = array('d')
+        self.close = array('d')
+        self.high = array('d')
+        self.low = array('d')
+        self.score = array('d')
+        self.ganZhi: List[str] = []
+        self.superLuck: List[Optional[str]] = []
+        self.reason: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.age)
+
+    def __getitem__(self, i: int) -> KLinePoint:
+        return KLinePoint.model_construct(**{field: getattr(self, field)[i] for field in ROW_FIELDS})
+
+    def __iter__(self) -> Iterator[KLinePoint]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ChartSeries):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"ChartSeries(len={len(self)})"
+
+    def append(self, age: int, year: int, ganZhi: str, superLuck: Optional[str],
+               open: float, close: float, high: float, low: float, score: float, reason: str):
+        self.age.append(int(age))
+        self.year.append(int(year))
+        self.open.append(float(open))
+        self.close.append(float(close))
+        self.high.append(float(high))
+        self.low.append(float(low))
+        self.score.append(float(score))
+        self.ganZhi.append(_intern(ganZhi))
+        self.superLuck.append(_intern(superLuck))
+        self.reason.append(_intern(reason))
+
+    @classmethod
+    def from_points(cls, points: Iterable[KLinePoint | Dict[str, Any]]) -> 'ChartSeries':
+        series = cls()
+        for point in points:
+            if not isinstance(point, KLinePoint):
+                # Validate raw dicts (LLM output, DB rows) through the schema once
+                point = KLinePoint(**point)
+            series.append(point.age, point.year, point.ganZhi, point.superLuck, point.open,
+                          point.close, point.high, point.low, point.score, point.reason)
+        return series
+
+    @classmethod
+    def from_columns(cls, columns: ChartColumns | Dict[str, Any]) -> 'ChartSeries':
+        if not isinstance(columns, ChartColumns):
+            columns = ChartColumns(**columns)
+        series = cls()
+        for field in NUMERIC_INT_FIELDS + NUMERIC_FLOAT_FIELDS:
+            getattr(series, field).extend(getattr(columns, field))
+        for field in STRING_FIELDS:
+            getattr(series, field).extend(_intern(v) for v in getattr(columns, field))
+        return series
+
+    def to_points(self) -> List[KLinePoint]:
+        return list(self)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        columns = [getattr(self, field) for field in ROW_FIELDS]
+        return [dict(zip(ROW_FIELDS, values)) for values in zip(*columns)]
+
+    def to_columns(self) -> ChartColumns:
+        return ChartColumns.model_construct(
+            age=self.age.tolist(), year=self.year.tolist(),
+            ganZhi=list(self.ganZhi), superLuck=list(self.superLuck),
+            open=self.open.tolist(), close=self.close.tolist(),
+            high=self.high.tolist(), low=self.low.tolist(),
+            score=self.score.tolist(), reason=list(self.reason),
+        )
+
+    @classmethod
+    def _validate(cls, value) -> 'ChartSeries':
+        if isinstance(value, ChartSeries):
+            return value
+        if isinstance(value, (ChartColumns, dict)):
+            return cls.from_columns(value)
+        return cls.from_points(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # Accepts rows (the public chartData shape), columns or a ChartSeries,
+        # and always serializes as rows
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda series: series.to_rows()),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return handler(core_schema.list_schema(KLinePoint.__pydantic_core_schema__))
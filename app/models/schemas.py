@@ -1,6 +1,7 @@
 from enum import Enum
 from typing import List, Optional, Union
 from pydantic import BaseModel, Field, ConfigDict
+from app.models.chart import KLinePoint, ChartColumns, ChartSeries
 
 class Gender(str, Enum):
     MALE = 'Male'
@@ -21,18 +22,6 @@ class UserInput(BaseModel):
     apiBaseUrl: Optional[str] = None
     apiKey: Optional[str] = None
 
-class KLinePoint(BaseModel):
-    age: int
-    year: int
-    ganZhi: str
-    superLuck: Optional[str] = None
-    open: float
-    close: float
-    high: float
-    low: float
-    score: float
-    reason: str
-
 class AnalysisData(BaseModel):
     bazi: List[str]
     summary: str
@@ -57,5 +46,10 @@ class AnalysisData(BaseModel):
     cryptoStyle: str
 
 class LifeDestinyResult(BaseModel):
-    chartData: List[KLinePoint]
+    # Stored columnar, serialized as the List[KLinePoint] rows the frontend expects
+    chartData: ChartSeries
+    analysis: AnalysisData
+
+class LifeDestinyColumnarResult(BaseModel):
+    chartColumns: ChartColumns
     analysis: AnalysisData
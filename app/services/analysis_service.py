@@ -1,16 +1,23 @@
+import asyncio
 import json
-import re
 import os
-import httpx
+from functools import lru_cache
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, cast, bindparam, Text
 from app.models.schemas import UserInput, LifeDestinyResult, Gender
 from app.services.random_gen import generate_random_life_result
-from app.utils.bazi import get_stem_polarity
+from app.utils.bazi import get_stem_polarity, is_da_yun_forward, da_yun_sequence, da_yun_steps, fix_chart_pillars
 from app.models.db_models import AnalysisResult
 from app.db.redis_ import get_redis
-from app.db.database import AsyncSessionLocal
+from app.db.database import AsyncSessionLocal, ReadSessionLocal, is_replica_session
+from app.services.decode import build_result, decode_cache_payload, dump_cache_payload
+from app.services.executor import byte_size, run_decode
+from app.services.llm import hedged_completion
+from app.services.providers import ProviderConfig, get_provider_pool
+from app.services import cache_policy
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, create_task_with_deadline, with_deadline
 
 BAZI_SYSTEM_INSTRUCTION = """
 你是一位八字命理大师，精通加密货币市场周期。根据用户提供的四柱干支和大运信息，生成"人生K线图"数据和命理报告。
@@ -67,14 +74,10 @@ BAZI_SYSTEM_INSTRUCTION = """
 """
 
 
-def get_stem_polarity(pillar: str) -> str:
-    if not pillar:
-        return 'YANG'
-    first_char = pillar.strip()[0]
-    yang_stems = ['甲', '丙', '戊', '庚', '壬']
-    if first_char in yang_stems:
-        return 'YANG'
-    return 'YIN'
+@lru_cache(maxsize=None)
+def load_mock_data() -> dict:
+    with open('mock_data.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 
 async def generate_life_analysis(input_data: UserInput) -> LifeDestinyResult:
@@ -88,43 +91,21 @@ async def generate_life_analysis(input_data: UserInput) -> LifeDestinyResult:
 
     if api_key.lower() == 'demo':
         print('🎯 使用本地演示模式')
-        with open('mock_data.json', 'r', encoding='utf-8') as f:
-            mock_data = json.load(f)
-
-        return LifeDestinyResult(
-            chartData=mock_data['chartPoints'],
-            analysis={
-                'bazi': mock_data.get('bazi', []),
-                'summary': mock_data.get('summary', "无摘要"),
-                'summaryScore': mock_data.get('summaryScore', 5),
-                'personality': mock_data.get('personality', "无性格分析"),
-                'personalityScore': mock_data.get('personalityScore', 5),
-                'industry': mock_data.get('industry', "无"),
-                'industryScore': mock_data.get('industryScore', 5),
-                'geomancy': mock_data.get('geomancy', "建议多亲近自然，保持心境平和。"),
-                'geomancyScore': mock_data.get('geomancyScore', 5),
-                'wealth': mock_data.get('wealth', "无"),
-                'wealthScore': mock_data.get('wealthScore', 5),
-                'marriage': mock_data.get('marriage', "无"),
-                'marriageScore': mock_data.get('marriageScore', 5),
-                'health': mock_data.get('health', "无"),
-                'healthScore': mock_data.get('healthScore', 5),
-                'family': mock_data.get('family', "无"),
-                'familyScore': mock_data.get('familyScore', 5),
-                'crypto': mock_data.get('crypto', "暂无交易分析"),
-                'cryptoScore': mock_data.get('cryptoScore', 5),
-                'cryptoYear': mock_data.get('cryptoYear', "待定"),
-                'cryptoStyle': mock_data.get('cryptoStyle', "现货定投"),
-            }
-        )
+        return build_result(load_mock_data())
     elif api_key.lower() == 'random':
         print('🎲 使用随机生成模式')
         return generate_random_life_result(input_data)
 
     # Random Data Mode (handled above)
 
+    if input_data.apiKey or input_data.apiBaseUrl or input_data.modelName:
+        # User supplied their own endpoint: call it alone, no hedging onto our providers
+        providers = [ProviderConfig(name='user', base_url=base_url, model=model_name, api_key=api_key)]
+    else:
+        providers = [p for p in get_provider_pool() if p.api_key]
+
     # Validation: If no key is found at all
-    if not api_key:
+    if not providers:
         # 402 Payment Required allows frontend to identify "Quota/Key Missing" state
         raise HTTPException(status_code=402, detail="服务器免费额度已用完，请在'高级设置'中填写您自己的 API Key。")
 
@@ -139,14 +120,16 @@ async def generate_life_analysis(input_data: UserInput) -> LifeDestinyResult:
         start_age_int = 1
 
     year_stem_polarity = get_stem_polarity(input_data.yearPillar)
-
-    if input_data.gender == Gender.MALE:
-        is_forward = (year_stem_polarity == 'YANG')
-    else:
-        is_forward = (year_stem_polarity == 'YIN')
+    is_forward = is_da_yun_forward(input_data.gender, input_data.yearPillar)
 
     da_yun_direction_str = '顺行 (Forward)' if is_forward else '逆行 (Backward)'
     direction_example = "例如：第一步是【戊申】，第二步则是【己酉】（顺排）" if is_forward else "例如：第一步是【戊申】，第二步则是【丁未】（逆排）"
+    try:
+        sequence = da_yun_sequence(input_data.firstSuperLuck.strip(), is_forward, da_yun_steps(start_age_int))
+        direction_example = f"已排好的大运序列（请直接使用）：{' -> '.join(sequence)}"
+    except ValueError:
+        # Not a valid jiazi pillar: leave the sequence to the model
+        pass
 
     user_prompt = f"""
     请根据以下**已经排好的**八字四柱和**指定的大运信息**进行分析。
@@ -193,84 +176,16 @@ async def generate_life_analysis(input_data: UserInput) -> LifeDestinyResult:
     请严格按照系统指令生成 JSON 数据。
     """
 
-    try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{base_url}/chat/completions",
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {api_key}'
-                },
-                json={
-                    'model': model_name,
-                    'messages': [
-                        {"role": "system",
-                         "content": BAZI_SYSTEM_INSTRUCTION + "\n\n请务必只返回纯JSON格式数据，不要包含任何markdown代码块标记。"},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    'temperature': 0.7,
-                    'max_tokens': 30000
-                }
-            )
-
-            if response.status_code == 401 or response.status_code == 402 or response.status_code == 429:
-                # Propagate these specific errors so frontend knows to ask user for key
-                raise HTTPException(status_code=402,
-                                    detail=f"API 调用失败 ({response.status_code})：服务器免费额度可能已耗尽，请尝试提供您自己的 API Key。")
-
-            if response.status_code != 200:
-                raise Exception(f"API 请求失败: {response.status_code} - {response.text}")
-
-            json_result = response.json()
-            content = json_result['choices'][0]['message']['content']
-
-            if not content:
-                raise Exception("模型未返回任何内容。")
-
-            # Extract JSON from markdown code blocks if present
-            json_content = content
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', content)
-            if json_match:
-                json_content = json_match.group(1).strip()
-            else:
-                json_start_index = content.find('{')
-                json_end_index = content.rfind('}')
-                if json_start_index != -1 and json_end_index != -1:
-                    json_content = content[json_start_index:json_end_index + 1]
-
-            data = json.loads(json_content)
-
-            # Basic Validation
-            if 'chartPoints' not in data or not isinstance(data['chartPoints'], list):
-                raise ValueError("模型返回的数据格式不正确（缺失 chartPoints）。")
-
-            return LifeDestinyResult(
-                chartData=data['chartPoints'],
-                analysis={
-                    'bazi': data.get('bazi', []),
-                    'summary': data.get('summary', "无摘要"),
-                    'summaryScore': data.get('summaryScore', 5),
-                    'personality': data.get('personality', "无性格分析"),
-                    'personalityScore': data.get('personalityScore', 5),
-                    'industry': data.get('industry', "无"),
-                    'industryScore': data.get('industryScore', 5),
-                    'geomancy': data.get('geomancy', "建议多亲近自然，保持心境平和。"),
-                    'geomancyScore': data.get('geomancyScore', 5),
-                    'wealth': data.get('wealth', "无"),
-                    'wealthScore': data.get('wealthScore', 5),
-                    'marriage': data.get('marriage', "无"),
-                    'marriageScore': data.get('marriageScore', 5),
-                    'health': data.get('health', "无"),
-                    'healthScore': data.get('healthScore', 5),
-                    'family': data.get('family', "无"),
-                    'familyScore': data.get('familyScore', 5),
-                    'crypto': data.get('crypto', "暂无交易分析"),
-                    'cryptoScore': data.get('cryptoScore', 5),
-                    'cryptoYear': data.get('cryptoYear', "待定"),
-                    'cryptoStyle': data.get('cryptoStyle', "现货定投"),
-                }
-            )
+    messages = [
+        {"role": "system",
+         "content": BAZI_SYSTEM_INSTRUCTION + "\n\n请务必只返回纯JSON格式数据，不要包含任何markdown代码块标记。"},
+        {"role": "user", "content": user_prompt}
+    ]
 
+    try:
+        result = await hedged_completion(providers, messages)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Gemini/OpenAI API Error: {e}")
         # Only raise 402 if it looks like an API quota issue, otherwise re-raise or 500
@@ -278,43 +193,132 @@ async def generate_life_analysis(input_data: UserInput) -> LifeDestinyResult:
         raise HTTPException(status_code=402,
                             detail=f"API 调用失败：{str(e)}。服务器免费额度可能已耗尽，请尝试提供您自己的 API Key。")
 
+    # Models often get the yearly ganZhi or the (backward) da-yun wrong; fix both from the tables
+    try:
+        birth_year = int(input_data.birthYear)
+    except (ValueError, TypeError):
+        return result
+    fixes = fix_chart_pillars(result.chartData, birth_year, start_age_int, input_data.firstSuperLuck, is_forward)
+    if fixes:
+        print(f"Corrected {fixes} calendar fields in model output")
+    return result
+
+
+# Hashes with a background refresh in flight, and strong references to those tasks
+_refreshing: set = set()
+_refresh_tasks: set = set()
+
 
 async def get_cached_analysis(input_hash: str) -> LifeDestinyResult | None:
     redis = await get_redis()
+    key = cache_policy.cache_key(input_hash)
     try:
-        cached_data = await redis.get(f"analysis:{input_hash}")
-        if cached_data:
-            try:
-                data = json.loads(cached_data)
-                return LifeDestinyResult(**data)
-            except Exception as e:
-                print(f"Error parsing cached data: {e}")
-                return None
+        pipe = redis.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        cached_data, ttl = await with_deadline(pipe.execute(), settings.REDIS_TIMEOUT)
+    except DeadlineExceeded:
+        print("Redis lookup skipped: request deadline exceeded")
+        cache_policy.record('deadline_exceeded')
+        cache_policy.record('misses')
+        return None
     except Exception as e:
         print(f"Redis error: {e}")
-    return None
+        cache_policy.record('errors')
+        cache_policy.record('misses')
+        return None
+    if not cached_data:
+        cache_policy.record('misses')
+        return None
+
+    cache_policy.record('hits')
+    # Popularity bookkeeping only; a failure here must not throw away the cached entry
+    try:
+        # Misses are not counted, so lookups for unknown hashes leave no counter behind
+        hits = await with_deadline(cache_policy.count_hit(redis, input_hash), settings.REDIS_TIMEOUT)
+        if cache_policy.is_stale(ttl):
+            # Serve the near-expiry entry now and re-populate it from the DB behind the response
+            cache_policy.record('stale_served')
+            schedule_refresh(input_hash)
+        elif cache_policy.should_extend(hits, ttl):
+            cache_policy.record('ttl_extensions')
+            await with_deadline(redis.expire(key, settings.CACHE_HOT_TTL), settings.REDIS_TIMEOUT)
+    except Exception as e:
+        print(f"Redis error while counting hit: {e!r}")
+        cache_policy.record('errors')
+
+    try:
+        return await run_decode(decode_cache_payload, cached_data, size=byte_size(cached_data))
+    except Exception as e:
+        print(f"Error parsing cached data: {e}")
+        return None
+
+def schedule_refresh(input_hash: str):
+    if input_hash in _refreshing:
+        return
+    _refreshing.add(input_hash)
+    # Runs past the response, so on its own budget rather than the triggering request's
+    task = create_task_with_deadline(refresh_cached_analysis(input_hash), settings.DB_TIMEOUT)
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+async def refresh_cached_analysis(input_hash: str):
+    try:
+        async with ReadSessionLocal() as session:
+            result = await get_db_analysis(session, input_hash)
+        if result:
+            cache_policy.record('refreshes')
+            await cache_analysis(input_hash, result)
+    finally:
+        _refreshing.discard(input_hash)
+
+# Built once so SQLAlchemy's compiled cache and asyncpg's per-connection prepared
+# statement cache are hit on every lookup. The JSON column is fetched as raw text so
+# decoding happens in run_decode, not on the loop.
+LOOKUP_BY_HASH = (
+    select(cast(AnalysisResult.data, Text))
+    .where(AnalysisResult.input_hash == bindparam("input_hash"))
+    .limit(1)
+)
 
 async def get_db_analysis(db: AsyncSession, input_hash: str) -> LifeDestinyResult | None:
     try:
-        result = await db.execute(select(AnalysisResult).filter(AnalysisResult.input_hash == input_hash))
-        record = result.scalars().first()
-        if record:
-            try:
-                return LifeDestinyResult(**record.data)
-            except Exception as e:
-                print(f"Error parsing db data: {e}")
-                return None
+        result = await with_deadline(db.execute(LOOKUP_BY_HASH, {"input_hash": input_hash}), settings.DB_TIMEOUT)
+        raw = result.scalars().first()
     except Exception as e:
         print(f"DB error: {e}")
+        if not is_replica_session(db):
+            return None
+        # Replica unavailable: fall back to the primary
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await with_deadline(session.execute(LOOKUP_BY_HASH, {"input_hash": input_hash}),
+                                             settings.DB_TIMEOUT)
+                raw = result.scalars().first()
+        except Exception as e:
+            print(f"DB error: {e}")
+            return None
+    if raw:
+        try:
+            return await run_decode(decode_cache_payload, raw, size=byte_size(raw))
+        except Exception as e:
+            print(f"Error parsing db data: {e}")
+            return None
     return None
 
-async def save_analysis_async(input_hash: str, result: LifeDestinyResult):
-    # Save to Redis
+async def cache_analysis(input_hash: str, result: LifeDestinyResult):
     try:
         redis = await get_redis()
-        await redis.set(f"analysis:{input_hash}", result.model_dump_json(), ex=3600*24*7) # Cache for 7 days
+        # TTL follows popularity: keys read often in the access window get the long hot TTL
+        hits = int(await redis.get(cache_policy.hits_key(input_hash)) or 0)
+        cache_policy.record('hot_writes' if cache_policy.is_hot(hits) else 'cold_writes')
+        await redis.set(cache_policy.cache_key(input_hash), dump_cache_payload(result), ex=cache_policy.ttl_for(hits))
     except Exception as e:
         print(f"Error saving to Redis: {e}")
+
+async def save_analysis_async(input_hash: str, result: LifeDestinyResult):
+    # Save to Redis
+    await cache_analysis(input_hash, result)
     
     # Save to DB
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,97 @@
+from redis.exceptions import ResponseError
+from app.core.config import settings
+
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'stale_served': 0,
+    'refreshes': 0,
+    'ttl_extensions': 0,
+    'hot_writes': 0,
+    'cold_writes': 0,
+    'errors': 0,
+    'deadline_exceeded': 0,
+}
+
+# Cleared the first time the server rejects EXPIRE NX (Redis < 7)
+_expire_nx = True
+
+
+def cache_key(input_hash: str) -> str:
+    return f"analysis:{input_hash}"
+
+
+def hits_key(input_hash: str) -> str:
+    # Access counter for the current window; only cache hits create it
+    return f"analysis:hits:{input_hash}"
+
+
+def is_hot(hits: int) -> bool:
+    return hits >= settings.CACHE_HOT_HITS
+
+
+def ttl_for(hits: int) -> int:
+    """TTL for a (re)written entry: popular keys stay long, the rest expire early."""
+    return settings.CACHE_HOT_TTL if is_hot(hits) else settings.CACHE_COLD_TTL
+
+
+def should_extend(hits: int, ttl: int) -> bool:
+    # Only bump hot keys once they have used up half of the hot TTL, to keep EXPIRE calls rare
+    return is_hot(hits) and 0 <= ttl < settings.CACHE_HOT_TTL // 2
+
+
+def is_stale(ttl: int) -> bool:
+    # ttl is -1 for keys without expiry and -2 for missing keys
+    return 0 <= ttl < settings.CACHE_STALE_SECONDS
+
+
+async def count_hit(redis, input_hash: str) -> int:
+    """Count a cache hit and return the hits in the current access window.
+
+    The window is fixed from the first hit, so the counter resets every
+    CACHE_ACCESS_WINDOW seconds instead of living as long as reads continue. Uses
+    EXPIRE NX on Redis >= 7 and a TTL check before EXPIRE on older servers.
+    """
+    global _expire_nx
+    key = hits_key(input_hash)
+    pipe = redis.pipeline(transaction=False)
+    pipe.incr(key)
+    if _expire_nx:
+        pipe.expire(key, settings.CACHE_ACCESS_WINDOW, nx=True)
+    else:
+        pipe.ttl(key)
+    hits, reply = await pipe.execute(raise_on_error=False)
+    if isinstance(hits, Exception):
+        raise hits
+    if isinstance(reply, ResponseError):
+        print(f"EXPIRE NX not supported ({reply}), falling back to TTL + EXPIRE")
+        _expire_nx = False
+        reply = await redis.ttl(key)
+    if not _expire_nx and reply == -1:
+        # Counter without expiry: this hit opened the window
+        await redis.expire(key, settings.CACHE_ACCESS_WINDOW)
+    return hits
+
+
+def record(event: str, count: int = 1):
+    _stats[event] += count
+
+
+async def get_cache_stats(redis) -> dict:
+    lookups = _stats['hits'] + _stats['misses']
+    stats = {
+        **_stats,
+        'hit_ratio': _stats['hits'] / lookups if lookups else 0.0,
+        'hot_ttl': settings.CACHE_HOT_TTL,
+        'cold_ttl': settings.CACHE_COLD_TTL,
+    }
+    try:
+        info = await redis.info()
+        stats['redis'] = {
+            key: info.get(key)
+            for key in ('keyspace_hits', 'keyspace_misses', 'evicted_keys', 'expired_keys',
+                        'used_memory', 'used_memory_peak', 'maxmemory', 'maxmemory_policy')
+        }
+    except Exception as e:
+        print(f"Redis error: {e}")
+    return stats
@@ -0,0 +1,88 @@
+import json
+import re
+from app.models.schemas import LifeDestinyResult, LifeDestinyColumnarResult
+from app.models.chart import ChartSeries
+
+# Everything in this module is pure and top-level so it can run in a thread or process pool
+# (see app/services/executor.py) instead of on the event loop.
+
+JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)```')
+
+
+def extract_json_content(content: str) -> str:
+    # Extract JSON from markdown code blocks if present
+    json_match = JSON_BLOCK_RE.search(content)
+    if json_match:
+        return json_match.group(1).strip()
+    json_start_index = content.find('{')
+    json_end_index = content.rfind('}')
+    if json_start_index != -1 and json_end_index != -1:
+        return content[json_start_index:json_end_index + 1]
+    return content
+
+
+def build_result(data: dict) -> LifeDestinyResult:
+    # Basic Validation
+    if 'chartPoints' not in data or not isinstance(data['chartPoints'], list):
+        raise ValueError("模型返回的数据格式不正确（缺失 chartPoints）。")
+
+    return LifeDestinyResult(
+        # Validated once into columns; ganZhi/superLuck/reason strings are interned
+        chartData=ChartSeries.from_points(data['chartPoints']),
+        analysis={
+            'bazi': data.get('bazi', []),
+            'summary': data.get('summary', "无摘要"),
+            'summaryScore': data.get('summaryScore', 5),
+            'personality': data.get('personality', "无性格分析"),
+            'personalityScore': data.get('personalityScore', 5),
+            'industry': data.get('industry', "无"),
+            'industryScore': data.get('industryScore', 5),
+            'geomancy': data.get('geomancy', "建议多亲近自然，保持心境平和。"),
+            'geomancyScore': data.get('geomancyScore', 5),
+            'wealth': data.get('wealth', "无"),
+            'wealthScore': data.get('wealthScore', 5),
+            'marriage': data.get('marriage', "无"),
+            'marriageScore': data.get('marriageScore', 5),
+            'health': data.get('health', "无"),
+            'healthScore': data.get('healthScore', 5),
+            'family': data.get('family', "无"),
+            'familyScore': data.get('familyScore', 5),
+            'crypto': data.get('crypto', "暂无交易分析"),
+            'cryptoScore': data.get('cryptoScore', 5),
+            'cryptoYear': data.get('cryptoYear', "待定"),
+            'cryptoStyle': data.get('cryptoStyle', "现货定投"),
+        }
+    )
+
+
+def parse_model_content(content: str) -> LifeDestinyResult:
+    if not content:
+        raise Exception("模型未返回任何内容。")
+    data = json.loads(extract_json_content(content))
+    return build_result(data)
+
+
+def parse_completion_body(body: bytes | str) -> LifeDestinyResult:
+    json_result = json.loads(body)
+    content = json_result['choices'][0]['message']['content']
+    return parse_model_content(content)
+
+
+def to_columnar_result(result: LifeDestinyResult) -> LifeDestinyColumnarResult:
+    return LifeDestinyColumnarResult(chartColumns=result.chartData.to_columns(), analysis=result.analysis)
+
+
+def dump_cache_payload(result: LifeDestinyResult) -> str:
+    # Cache entries are stored columnar: field names are written once instead of 100 times
+    return to_columnar_result(result).model_dump_json()
+
+
+def load_cache_payload(data: dict) -> LifeDestinyResult:
+    if 'chartColumns' in data:
+        return LifeDestinyResult(chartData=ChartSeries.from_columns(data['chartColumns']), analysis=data['analysis'])
+    # Entries written before the columnar format
+    return LifeDestinyResult(**data)
+
+
+def decode_cache_payload(raw: bytes | str) -> LifeDestinyResult:
+    return load_cache_payload(json.loads(raw))
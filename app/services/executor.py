@@ -0,0 +1,82 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from app.core.config import settings
+
+_executor: Executor | None = None
+
+_stats = {
+    'inline': 0,
+    'offloaded': 0,
+    'errors': 0,
+    'queue_seconds_total': 0.0,
+    'queue_seconds_max': 0.0,
+    'run_seconds_total': 0.0,
+}
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.DECODE_EXECUTOR == 'process':
+            _executor = ProcessPoolExecutor(max_workers=settings.DECODE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=settings.DECODE_WORKERS, thread_name_prefix='decode')
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _timed_call(fn, submitted_at: float, *args):
+    # time.time() rather than a monotonic clock so the value is comparable across processes
+    started_at = time.time()
+    result = fn(*args)
+    return started_at - submitted_at, time.time() - started_at, result
+
+
+def byte_size(data: str | bytes) -> int:
+    # DECODE_INLINE_THRESHOLD is in bytes; model output is mostly CJK, 3 bytes per character
+    return len(data) if isinstance(data, (bytes, bytearray)) else len(data.encode())
+
+
+async def run_decode(fn, *args, size: int | None = None):
+    """Run a CPU-bound decode/validate function off the event loop.
+
+    Payloads smaller than DECODE_INLINE_THRESHOLD bytes (or everything, when
+    DECODE_EXECUTOR is "inline") run directly since the hop costs more than the work.
+    """
+    if settings.DECODE_EXECUTOR == 'inline' or (size is not None and size < settings.DECODE_INLINE_THRESHOLD):
+        _stats['inline'] += 1
+        return fn(*args)
+
+    loop = asyncio.get_running_loop()
+    try:
+        queue_seconds, run_seconds, result = await loop.run_in_executor(
+            get_executor(), _timed_call, fn, time.time(), *args
+        )
+    except Exception:
+        _stats['errors'] += 1
+        raise
+
+    _stats['offloaded'] += 1
+    _stats['queue_seconds_total'] += queue_seconds
+    _stats['queue_seconds_max'] = max(_stats['queue_seconds_max'], queue_seconds)
+    _stats['run_seconds_total'] += run_seconds
+    return result
+
+
+def get_decode_stats() -> dict:
+    offloaded = _stats['offloaded']
+    return {
+        'executor': settings.DECODE_EXECUTOR,
+        'workers': settings.DECODE_WORKERS,
+        'inline_threshold': settings.DECODE_INLINE_THRESHOLD,
+        **_stats,
+        'queue_seconds_avg': _stats['queue_seconds_total'] / offloaded if offloaded else 0.0,
+        'run_seconds_avg': _stats['run_seconds_total'] / offloaded if offloaded else 0.0,
+    }
@@ -0,0 +1,118 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Set
+from app.models.schemas import LifeDestinyResult
+from app.core.config import settings
+from app.core.deadline import create_task_with_deadline, current_deadline, DeadlineExceeded
+
+DISCONNECT_POLL_INTERVAL = 1.0
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class InflightGeneration:
+    """One upstream generation shared by every request for the same input hash."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        # Set when any waiter opted into "finish and cache"; the task then survives disconnects
+        self.keep = False
+
+
+_inflight: Dict[str, InflightGeneration] = {}
+# Strong references to fire-and-forget save tasks
+_background: Set[asyncio.Task] = set()
+
+_stats = {
+    'started': 0,
+    'coalesced': 0,
+    'disconnects': 0,
+    'cancelled': 0,
+    'finished_detached': 0,
+}
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def _forget(key: str, entry: InflightGeneration):
+    # Only drop our own entry: a newer generation may already have taken the slot
+    if _inflight.get(key) is entry:
+        del _inflight[key]
+
+
+def _start(key: str, input_hash: str, generate: Callable[[], Awaitable[LifeDestinyResult]],
+           save: Callable[[str, LifeDestinyResult], Awaitable[None]]) -> InflightGeneration:
+    # Shared by every waiter, so it runs on its own budget; each waiter enforces its
+    # own deadline in join_generation
+    task = create_task_with_deadline(generate(), settings.REQUEST_DEADLINE_MAX_SECONDS)
+    entry = InflightGeneration(task)
+
+    def on_done(t: asyncio.Task):
+        _forget(key, entry)
+        if t.cancelled() or t.exception() is not None:
+            return
+        if entry.waiters == 0:
+            _stats['finished_detached'] += 1
+        # Saved here rather than in the response's BackgroundTasks so a result kept
+        # alive after every client left still reaches Redis and the DB
+        _spawn(save(input_hash, t.result()))
+
+    task.add_done_callback(on_done)
+    _inflight[key] = entry
+    _stats['started'] += 1
+    return entry
+
+
+async def join_generation(input_hash: str,
+                          generate: Callable[[], Awaitable[LifeDestinyResult]],
+                          save: Callable[[str, LifeDestinyResult], Awaitable[None]],
+                          is_disconnected: Callable[[], Awaitable[bool]],
+                          finish_on_disconnect: bool = False,
+                          key: str | None = None) -> LifeDestinyResult:
+    """Wait for the generation of `input_hash`, starting it if nobody else has.
+
+    The upstream call is cancelled once the last waiter has disconnected or run out of
+    deadline, unless one of them asked to finish and cache the result anyway. Requests
+    only share a generation when their `key` (default: `input_hash`) matches.
+    """
+    key = key or input_hash
+    entry = _inflight.get(key)
+    if entry is None:
+        entry = _start(key, input_hash, generate, save)
+    else:
+        _stats['coalesced'] += 1
+
+    entry.waiters += 1
+    entry.keep = entry.keep or finish_on_disconnect
+    try:
+        while True:
+            timeout = DISCONNECT_POLL_INTERVAL
+            deadline = current_deadline()
+            if deadline is not None:
+                if deadline.expired:
+                    raise DeadlineExceeded(f"request deadline of {deadline.seconds:.1f}s exceeded")
+                timeout = min(timeout, deadline.remaining())
+            done, _ = await asyncio.wait({entry.task}, timeout=timeout)
+            if done:
+                return entry.task.result()
+            if await is_disconnected():
+                _stats['disconnects'] += 1
+                raise ClientDisconnected()
+    finally:
+        entry.waiters -= 1
+        if entry.waiters == 0 and not entry.keep and not entry.task.done():
+            _stats['cancelled'] += 1
+            entry.task.cancel()
+            # Unregister now rather than in on_done, a few loop turns later, so the next
+            # request starts a fresh generation instead of joining the cancelled one
+            _forget(key, entry)
+
+
+def get_generation_stats() -> dict:
+    return {'inflight': len(_inflight), **_stats}
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Tuple
+import httpx
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, stage_timeout, with_deadline
+from app.core.http import get_http_client
+from app.models.schemas import LifeDestinyResult
+from app.services.decode import parse_completion_body, parse_model_content
+from app.services.executor import byte_size, run_decode
+from app.services.providers import ProviderConfig, get_stats
+
+
+async def stream_completion(provider: ProviderConfig, messages: List[dict],
+                            first_token: asyncio.Event) -> LifeDestinyResult:
+    """Call one provider's chat/completions with streaming and parse the result.
+
+    `first_token` is set as soon as the model emits any content (or reasoning) token.
+    An attempt cancelled or timed out before one records its elapsed time as a lower bound.
+    """
+    stats = get_stats(provider)
+    stats.requests += 1
+    started_at = time.monotonic()
+    try:
+        client = get_http_client()
+        async with client.stream(
+            "POST",
+            f"{provider.base_url}/chat/completions",
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {provider.api_key}'
+            },
+            json={
+                'model': provider.model,
+                'messages': messages,
+                'temperature': 0.7,
+                'max_tokens': 30000,
+                'stream': True,
+            },
+            timeout=stage_timeout(settings.LLM_TIMEOUT),
+        ) as response:
+            if response.status_code == 401 or response.status_code == 402 or response.status_code == 429:
+                # Propagate these specific errors so frontend knows to ask user for key
+                raise HTTPException(status_code=402,
+                                    detail=f"API 调用失败 ({response.status_code})：服务器免费额度可能已耗尽，请尝试提供您自己的 API Key。")
+
+            if response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"API 请求失败: {response.status_code} - {body.decode(errors='replace')}")
+
+            if 'text/event-stream' not in response.headers.get('content-type', ''):
+                # Provider ignored `stream` and sent a plain JSON body
+                body = await response.aread()
+                stats.record_first_token(time.monotonic() - started_at)
+                first_token.set()
+                return await run_decode(parse_completion_body, body, size=len(body))
+
+            parts = []
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                chunk = line[5:].strip()
+                if chunk == '[DONE]':
+                    break
+                choices = json.loads(chunk).get('choices') or [{}]
+                delta = choices[0].get('delta') or {}
+                piece = delta.get('content')
+                if not first_token.is_set() and (piece or delta.get('reasoning_content')):
+                    stats.record_first_token(time.monotonic() - started_at)
+                    first_token.set()
+                if piece:
+                    parts.append(piece)
+    except (asyncio.CancelledError, asyncio.TimeoutError, httpx.TimeoutException, DeadlineExceeded):
+        # Still waiting when it was hedged away or timed out; HTTP errors are not latency samples
+        if not first_token.is_set():
+            stats.record_lower_bound(time.monotonic() - started_at)
+        raise
+
+    content = ''.join(parts)
+    # json.loads + regex extraction + validation of a multi-thousand-token body is CPU-bound
+    return await run_decode(parse_model_content, content, size=byte_size(content))
+
+
+async def hedged_completion(providers: List[ProviderConfig], messages: List[dict]) -> LifeDestinyResult:
+    """Generate with an ordered provider pool.
+
+    The first provider starts immediately. If the newest attempt has not produced a
+    first token within its provider's adaptive hedge delay, the next provider is fired
+    as well; a failed attempt falls back to the next provider straight away. The first
+    valid result wins and every other attempt is cancelled. Running out of request
+    deadline ends the whole call instead of falling back.
+    """
+    remaining = list(providers)
+    running: Dict[asyncio.Task, ProviderConfig] = {}
+    newest: Tuple[ProviderConfig, asyncio.Event, float] | None = None
+    last_error: BaseException | None = None
+
+    def launch():
+        nonlocal newest
+        provider = remaining.pop(0)
+        first_token = asyncio.Event()
+        task = asyncio.create_task(with_deadline(stream_completion(provider, messages, first_token),
+                                                 settings.LLM_TIMEOUT))
+        running[task] = provider
+        newest = (provider, first_token, time.monotonic())
+
+    launch()
+    try:
+        while running:
+            timeout = None
+            provider, first_token, launched_at = newest
+            if settings.HEDGE_ENABLED and remaining and not first_token.is_set():
+                timeout = max(0.0, launched_at + get_stats(provider).hedge_delay() - time.monotonic())
+
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if not first_token.is_set():
+                    print(f"Hedging: {provider.name} has no first token yet, firing {remaining[0].name}")
+                    get_stats(provider).hedged += 1
+                    launch()
+                continue
+
+            for task in done:
+                provider = running.pop(task)
+                stats = get_stats(provider)
+                error = task.exception()
+                if error is None:
+                    stats.successes += 1
+                    return task.result()
+                if isinstance(error, DeadlineExceeded):
+                    # The request ran out of budget; not the provider's fault, and no
+                    # other provider can finish in time either
+                    raise error
+                stats.failures += 1
+                last_error = error
+                print(f"Provider {provider.name} failed: {error}")
+                if remaining:
+                    launch()
+        raise last_error
+    finally:
+        for task in running:
+            task.cancel()
+        # Let the losers unwind (and record their latency) before returning
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,103 @@
+import json
+import os
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from app.core.config import settings
+
+
+class ProviderConfig(BaseModel):
+    name: str
+    base_url: str
+    model: str
+    api_key: str = ""
+
+
+class ProviderStats:
+    """Per-provider first-token latency, smoothed like TCP's RTT estimator.
+
+    The hedge delay is `srtt + 4 * rttvar`, i.e. roughly "slower than this provider
+    usually is", so it adapts to each model's speed without manual tuning.
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+
+    def __init__(self):
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.hedged = 0
+
+    def record_first_token(self, seconds: float):
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - seconds)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * seconds
+
+    def record_lower_bound(self, seconds: float):
+        """An attempt that was cancelled or timed out before its first token.
+
+        Its latency is at least `seconds`; skipping it would bias the estimate towards
+        the attempts that were fast enough to finish, so it counts as a sample when it
+        is above the current estimate. Until a real first token has been seen there is
+        no estimate to correct, and a quick cancel must not seed one.
+        """
+        if self.srtt is not None and seconds > self.srtt:
+            self.record_first_token(seconds)
+
+    def hedge_delay(self) -> float:
+        if self.srtt is None:
+            return settings.HEDGE_DELAY_SECONDS
+        delay = self.srtt + 4 * self.rttvar
+        return max(settings.HEDGE_DELAY_MIN_SECONDS, min(settings.HEDGE_DELAY_MAX_SECONDS, delay))
+
+    def as_dict(self) -> dict:
+        return {
+            'first_token_srtt': self.srtt,
+            'first_token_rttvar': self.rttvar,
+            'hedge_delay': self.hedge_delay(),
+            'requests': self.requests,
+            'successes': self.successes,
+            'failures': self.failures,
+            'hedged': self.hedged,
+        }
+
+
+_pool: Optional[List[ProviderConfig]] = None
+_stats: Dict[str, ProviderStats] = {}
+
+
+def get_provider_pool() -> List[ProviderConfig]:
+    """Ordered providers from LLM_PROVIDERS (a JSON list), falling back to the GEMINI_* settings."""
+    global _pool
+    if _pool is None:
+        if settings.LLM_PROVIDERS:
+            _pool = [ProviderConfig(**p) for p in json.loads(settings.LLM_PROVIDERS)]
+        else:
+            _pool = [ProviderConfig(
+                name='default',
+                base_url=os.getenv("GEMINI_BASE_URL", "https://max.openai365.top/v1").strip().rstrip('/'),
+                model=os.getenv("GEMINI_MODEL_NAME", "gemini-3-pro-preview").strip(),
+                api_key=os.getenv("GEMINI_API_KEY", "").strip(),
+            )]
+    return _pool
+
+
+def provider_key(provider: ProviderConfig) -> str:
+    return f"{provider.name}:{provider.model}"
+
+
+def get_stats(provider: ProviderConfig) -> ProviderStats:
+    key = provider_key(provider)
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = ProviderStats()
+    return stats
+
+
+def get_provider_stats() -> dict:
+    return {key: stats.as_dict() for key, stats in _stats.items()}
@@ -1,14 +1,9 @@
 import random
 from app.models.schemas import UserInput  # use compatibility wrapper
-from app.models.schemas import LifeDestinyResult, KLinePoint, AnalysisData, UserInput as UIType
-
-GAN_WUXING = {
-    "甲": "木", "乙": "木",
-    "丙": "火", "丁": "火",
-    "戊": "土", "己": "土",
-    "庚": "金", "辛": "金",
-    "壬": "水", "癸": "水",
-}
+from app.models.schemas import LifeDestinyResult, AnalysisData, UserInput as UIType
+from app.models.chart import ChartSeries
+from app.utils.bazi import STEM_WUXING, JIAZI, CHILDHOOD_LUCK, year_gan_zhi
+
 WUXING_SCORE = {
     "木": 2,
     "火": 3,
@@ -19,17 +14,17 @@ WUXING_SCORE = {
 
 def calc_base_score(day_pillar: str) -> float:
     gan = day_pillar[0]
-    wuxing = GAN_WUXING.get(gan, "土")
+    wuxing = STEM_WUXING.get(gan, "土")
     return 50 + WUXING_SCORE[wuxing] * 5
 def calc_superluck_bonus(super_luck: str) -> float:
-    if super_luck == "童限":
+    if super_luck == CHILDHOOD_LUCK:
         return -5
     gan = super_luck[0]
-    wuxing = GAN_WUXING.get(gan, "土")
+    wuxing = STEM_WUXING.get(gan, "土")
     return WUXING_SCORE[wuxing] * 2
 def calc_year_bonus(gan_zhi: str) -> float:
     gan = gan_zhi[0]
-    wuxing = GAN_WUXING.get(gan, "土")
+    wuxing = STEM_WUXING.get(gan, "土")
     return WUXING_SCORE[wuxing]
 def calc_age_bonus(age: int) -> float:
     if age < 18:
@@ -57,25 +52,16 @@ def generate_life_result(input_data: UserInput) -> LifeDestinyResult:
     except Exception:
         start_age = 1
 
-    gan_zhis = [
-        "甲子","乙丑","丙寅","丁卯","戊辰","己巳","庚午","辛未","壬申","癸酉",
-        "甲戌","乙亥","丙子","丁丑","戊寅","己卯","庚辰","辛巳","壬午","癸未",
-        "甲申","乙酉","丙戌","丁亥","戊子","己丑","庚寅","辛卯","壬辰","癸巳",
-        "甲午","乙未","丙申","丁酉","戊戌","己亥","庚子","辛丑","壬寅","癸卯",
-        "甲辰","乙巳","丙午","丁未","戊申","己酉","庚戌","辛亥","壬子","癸丑",
-        "甲寅","乙卯","丙辰","丁巳","戊午","己未","庚申","辛酉","壬戌","癸亥"
-    ]
+    superLucks = JIAZI[:10]
 
-    superLucks = ["甲子","乙丑","丙寅","丁卯","戊辰","己巳","庚午","辛未","壬申","癸酉"]
-
-    chart_data = []
+    chart = ChartSeries()
     current_year = start_year
 
     base_score = calc_base_score(input_data.dayPillar)
 
     for age in range(start_age, 101):
-        gan_zhi = gan_zhis[(current_year - 4) % 60]
-        da_yun = superLucks[(age // 10) % 10] if age >= 10 else "童限"
+        gan_zhi = year_gan_zhi(current_year)
+        da_yun = superLucks[(age // 10) % 10] if age >= 10 else CHILDHOOD_LUCK
 
         score = (
             base_score
@@ -87,67 +73,66 @@ def generate_life_result(input_data: UserInput) -> LifeDestinyResult:
 
         score = max(10, min(90, score))
 
-        open_val = chart_data[-1].close if chart_data else score
+        open_val = chart.close[-1] if chart else score
         close_val = score
         high_val = max(open_val, close_val) + 2
         low_val = min(open_val, close_val) - 2
 
-        chart_data.append(
-            KLinePoint(
-                age=age,
-                year=current_year,
-                ganZhi=gan_zhi,
-                superLuck=da_yun,
-                open=round(open_val, 1),
-                close=round(close_val, 1),
-                high=round(high_val, 1),
-                low=round(low_val, 1),
-                score=round(score, 1),
-                reason="运势由命局、大运、流年与人生阶段综合决定"
-            )
+        chart.append(
+            age=age,
+            year=current_year,
+            ganZhi=gan_zhi,
+            superLuck=da_yun,
+            open=round(open_val, 1),
+            close=round(close_val, 1),
+            high=round(high_val, 1),
+            low=round(low_val, 1),
+            score=round(score, 1),
+            reason="运势由命局、大运、流年与人生阶段综合决定"
         )
 
         current_year += 1
-        s = int(base_score // 10)
 
-        analysis = AnalysisData(
-            bazi=[
-                input_data.yearPillar,
-                input_data.monthPillar,
-                input_data.dayPillar,
-                input_data.hourPillar,
-            ],
-            summary="命局稳定，中年运势最佳，晚年趋于平顺。",
-            summaryScore=s,
+    s = int(base_score // 10)
 
-            personality="性格积极主动，有进取心。",
-            personalityScore=min(9, s + 1),
+    analysis = AnalysisData(
+        bazi=[
+            input_data.yearPillar,
+            input_data.monthPillar,
+            input_data.dayPillar,
+            input_data.hourPillar,
+        ],
+        summary="命局稳定，中年运势最佳，晚年趋于平顺。",
+        summaryScore=s,
 
-            industry="适合技术、金融、管理类行业。",
-            industryScore=s,
+        personality="性格积极主动，有进取心。",
+        personalityScore=min(9, s + 1),
 
-            geomancy="宜南方或东南方发展。",
-            geomancyScore=s,
+        industry="适合技术、金融、管理类行业。",
+        industryScore=s,
 
-            wealth="财运循序渐进，中年见成。",
-            wealthScore=min(9, s + 1),
+        geomancy="宜南方或东南方发展。",
+        geomancyScore=s,
 
-            marriage="婚姻整体平稳，重在沟通。",
-            marriageScore=max(5, s - 1),
+        wealth="财运循序渐进，中年见成。",
+        wealthScore=min(9, s + 1),
 
-            health="注意心血管与作息规律。",
-            healthScore=max(5, s - 1),
+        marriage="婚姻整体平稳，重在沟通。",
+        marriageScore=max(5, s - 1),
 
-            family="家庭关系整体和谐。",
-            familyScore=s,
+        health="注意心血管与作息规律。",
+        healthScore=max(5, s - 1),
 
-            crypto="偏向长期价值投资。",
-            cryptoScore=s,
-            cryptoYear="2025 (乙巳)",
-            cryptoStyle="现货定投 + 低频波段"
-        )
+        family="家庭关系整体和谐。",
+        familyScore=s,
 
-        return LifeDestinyResult(chartData=chart_data, analysis=analysis)
+        crypto="偏向长期价值投资。",
+        cryptoScore=s,
+        cryptoYear="2025 (乙巳)",
+        cryptoStyle="现货定投 + 低频波段"
+    )
+
+    return LifeDestinyResult(chartData=chart, analysis=analysis)
 
 
 def generate_random_life_result(input_data: UIType) -> LifeDestinyResult:
@@ -164,19 +149,10 @@ def generate_random_life_result(input_data: UIType) -> LifeDestinyResult:
     except (ValueError, TypeError):
         start_age = 1
     
-    chart_data = []
+    chart = ChartSeries()
     current_year = start_year
     
-    gan_zhis = [
-        "甲子", "乙丑", "丙寅", "丁卯", "戊辰", "己巳", "庚午", "辛未", "壬申", "癸酉",
-        "甲戌", "乙亥", "丙子", "丁丑", "戊寅", "己卯", "庚辰", "辛巳", "壬午", "癸未",
-        "甲申", "乙酉", "丙戌", "丁亥", "戊子", "己丑", "庚寅", "辛卯", "壬辰", "癸巳",
-        "甲午", "乙未", "丙申", "丁酉", "戊戌", "己亥", "庚子", "辛丑", "壬寅", "癸卯",
-        "甲辰", "乙巳", "丙午", "丁未", "戊申", "己酉", "庚戌", "辛亥", "壬子", "癸丑",
-        "甲寅", "乙卯", "丙辰", "丁巳", "戊午", "己未", "庚申", "辛酉", "壬戌", "癸亥"
-    ]
-    
-    da_yuns = ["甲子", "乙丑", "丙寅", "丁卯", "戊辰", "己巳", "庚午", "辛未", "壬申", "癸酉"]
+    da_yuns = JIAZI[:10]
     
     reasons = [
         "今年运势平稳，适合积累。", "财星高照，有意外之喜。", "注意身体健康，避免过度劳累。",
@@ -186,17 +162,17 @@ def generate_random_life_result(input_data: UIType) -> LifeDestinyResult:
     ]
 
     for age in range(start_age, 101):
-        open_val = chart_data[-1].close if chart_data else 50.0
+        open_val = chart.close[-1] if chart else 50.0
         change = random.uniform(-15, 15)
         close_val = max(10, min(90, open_val + change))
         high_val = max(open_val, close_val) + random.uniform(0, 5)
         low_val = min(open_val, close_val) - random.uniform(0, 5)
         score_val = close_val 
-        gan_zhi = gan_zhis[(current_year - 4) % 60]
+        gan_zhi = year_gan_zhi(current_year)
         da_yun_idx = (age // 10) % len(da_yuns)
-        da_yun = da_yuns[da_yun_idx] if age >= 10 else "童限"
+        da_yun = da_yuns[da_yun_idx] if age >= 10 else CHILDHOOD_LUCK
 
-        point = KLinePoint(
+        chart.append(
             age=age,
             year=current_year,
             ganZhi=gan_zhi,
@@ -208,7 +184,6 @@ def generate_random_life_result(input_data: UIType) -> LifeDestinyResult:
             score=round(score_val, 1),
             reason=random.choice(reasons)
         )
-        chart_data.append(point)
         current_year += 1
 
     analysis = AnalysisData(
@@ -236,6 +211,6 @@ def generate_random_life_result(input_data: UIType) -> LifeDestinyResult:
     )
 
     return LifeDestinyResult(
-        chartData=chart_data,
+        chartData=chart,
         analysis=analysis
     )
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.db.database import engine, read_engine
+from app.db.redis_ import get_redis
+from app.services.analysis_service import LOOKUP_BY_HASH, load_mock_data
+from app.services.executor import get_executor
+from app.services.providers import get_provider_pool
+
+# Failed required steps are retried with this backoff (doubling up to the max)
+RETRY_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+_state = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'steps': {},
+}
+
+
+async def _warm_db():
+    async def open_connection(eng, prepare_lookup: bool):
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            if prepare_lookup:
+                # Primes the per-connection prepared statement for the hot input_hash lookup
+                await conn.execute(LOOKUP_BY_HASH, {"input_hash": ""})
+
+    # Held concurrently so the pool ends up with WARMUP_CONNECTIONS open connections
+    connections = min(settings.WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)
+    jobs = [open_connection(read_engine, True) for _ in range(connections)]
+    if read_engine is not engine:
+        jobs += [open_connection(engine, False) for _ in range(connections)]
+    await asyncio.gather(*jobs)
+
+
+async def _warm_redis():
+    redis = await get_redis()
+    await asyncio.gather(*(redis.ping() for _ in range(settings.WARMUP_CONNECTIONS)))
+
+
+async def _warm_http():
+    # Any response will do: the point is an established TLS connection in the pool
+    client = get_http_client()
+    await asyncio.gather(*(
+        client.get(f"{provider.base_url}/models", headers={'Authorization': f'Bearer {provider.api_key}'})
+        for provider in get_provider_pool() if provider.api_key
+    ))
+
+
+async def _warm_fixtures():
+    load_mock_data()
+    # Spawn the decode workers now instead of on the first large payload
+    executor = get_executor()
+    await asyncio.gather(*(
+        asyncio.wrap_future(executor.submit(int)) for _ in range(settings.DECODE_WORKERS)
+    ))
+
+
+STEPS = {
+    'db': _warm_db,
+    'redis': _warm_redis,
+    'http': _warm_http,
+    'fixtures': _warm_fixtures,
+}
+
+
+def required_steps() -> set:
+    return {name.strip() for name in settings.WARMUP_REQUIRED_STEPS.split(',') if name.strip()}
+
+
+async def _run_step(name: str, step) -> bool:
+    started_at = time.monotonic()
+    attempts = _state['steps'].get(name, {}).get('attempts', 0) + 1
+    try:
+        await asyncio.wait_for(step(), settings.WARMUP_TIMEOUT)
+        _state['steps'][name] = {'ok': True}
+    except Exception as e:
+        print(f"Warm-up step {name} failed: {e!r}")
+        _state['steps'][name] = {'ok': False, 'error': repr(e)}
+    _state['steps'][name]['attempts'] = attempts
+    _state['steps'][name]['seconds'] = round(time.monotonic() - started_at, 3)
+    return _state['steps'][name]['ok']
+
+
+async def warm_up():
+    """Pre-open connection pools and load fixtures, then flip readiness.
+
+    Steps listed in WARMUP_REQUIRED_STEPS (db and redis by default) must succeed: they
+    are retried with backoff and the worker stays out of rotation (/api/ready is 503)
+    until they do. Other steps may fail; they are only reported.
+    """
+    _state['started_at'] = time.time()
+    required = required_steps()
+    names = list(STEPS)
+    delay = RETRY_SECONDS
+    while True:
+        results = await asyncio.gather(*(_run_step(name, STEPS[name]) for name in names))
+        names = [name for name, ok in zip(names, results) if not ok and name in required]
+        if not names:
+            break
+        print(f"Warm-up: required steps {', '.join(names)} failed, retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+    _state['finished_at'] = time.time()
+    _state['ready'] = True
+    print("Warm-up finished")
+
+
+def mark_ready():
+    _state['ready'] = True
+
+
+def get_readiness() -> dict:
+    return dict(_state)
@@ -1,8 +1,99 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+from app.models.schemas import Gender
+from app.models.chart import ChartSeries
+
+HEAVENLY_STEMS = ('甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸')
+EARTHLY_BRANCHES = ('子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥')
+
+# 六十甲子: index i pairs stem i % 10 with branch i % 12
+JIAZI = tuple(HEAVENLY_STEMS[i % 10] + EARTHLY_BRANCHES[i % 12] for i in range(60))
+JIAZI_INDEX = {gan_zhi: i for i, gan_zhi in enumerate(JIAZI)}
+
+STEM_WUXING = {
+    "甲": "木", "乙": "木",
+    "丙": "火", "丁": "火",
+    "戊": "土", "己": "土",
+    "庚": "金", "辛": "金",
+    "壬": "水", "癸": "水",
+}
+BRANCH_WUXING = {
+    "子": "水", "丑": "土", "寅": "木", "卯": "木", "辰": "土", "巳": "火",
+    "午": "火", "未": "土", "申": "金", "酉": "金", "戌": "土", "亥": "水",
+}
+STEM_POLARITY = {stem: 'YANG' if i % 2 == 0 else 'YIN' for i, stem in enumerate(HEAVENLY_STEMS)}
+BRANCH_POLARITY = {branch: 'YANG' if i % 2 == 0 else 'YIN' for i, branch in enumerate(EARTHLY_BRANCHES)}
+
+CHILDHOOD_LUCK = "童限"
+MAX_AGE = 100
+
+
+def year_gan_zhi(year: int) -> str:
+    # 1984 is 甲子; the year pillar is taken by solar year, as everywhere else in the app
+    return JIAZI[(year - 4) % 60]
+
+
 def get_stem_polarity(pillar: str) -> str:
     if not pillar:
         return 'YANG'
-    first_char = pillar.strip()[0]
-    yang_stems = ['甲', '丙', '戊', '庚', '壬']
-    if first_char in yang_stems:
-        return 'YANG'
-    return 'YIN'
+    return STEM_POLARITY.get(pillar.strip()[0], 'YIN')
+
+
+def is_da_yun_forward(gender: Gender, year_pillar: str) -> bool:
+    # 阳男阴女顺行，阴男阳女逆行
+    year_stem_polarity = get_stem_polarity(year_pillar)
+    if gender == Gender.MALE:
+        return year_stem_polarity == 'YANG'
+    return year_stem_polarity == 'YIN'
+
+
+@lru_cache(maxsize=None)
+def da_yun_sequence(first_pillar: str, forward: bool, steps: int = 10) -> Tuple[str, ...]:
+    """The da-yun pillars starting at `first_pillar`, stepping through the 60 jiazi."""
+    first_pillar = first_pillar.strip()
+    if first_pillar not in JIAZI_INDEX:
+        raise ValueError(f"无效的大运干支：{first_pillar}")
+    start = JIAZI_INDEX[first_pillar]
+    step = 1 if forward else -1
+    return tuple(JIAZI[(start + step * i) % 60] for i in range(steps))
+
+
+def da_yun_steps(start_age: int) -> int:
+    # Enough 10-year steps to cover every age up to MAX_AGE
+    return max(1, (MAX_AGE - start_age) // 10 + 1)
+
+
+def da_yun_for_age(age: int, start_age: int, sequence: Tuple[str, ...]) -> str:
+    if age < start_age:
+        return CHILDHOOD_LUCK
+    return sequence[min((age - start_age) // 10, len(sequence) - 1)]
+
+
+def fix_chart_pillars(chart: ChartSeries, birth_year: int, start_age: int,
+                      first_super_luck: Optional[str], forward: bool) -> int:
+    """Check LLM chart columns against the calendar tables and correct them in place.
+
+    Ages are 虚岁, so age 1 is the birth year. `year` and `ganZhi` are always fixed;
+    `superLuck` only when `first_super_luck` is a valid pillar. Returns the number of
+    corrected fields.
+    """
+    sequence = None
+    if first_super_luck and first_super_luck.strip() in JIAZI_INDEX:
+        sequence = da_yun_sequence(first_super_luck.strip(), forward, da_yun_steps(start_age))
+
+    fixes = 0
+    for i, age in enumerate(chart.age):
+        year = birth_year + age - 1
+        if chart.year[i] != year:
+            chart.year[i] = year
+            fixes += 1
+        gan_zhi = year_gan_zhi(year)
+        if chart.ganZhi[i] != gan_zhi:
+            chart.ganZhi[i] = gan_zhi
+            fixes += 1
+        if sequence is not None:
+            super_luck = da_yun_for_age(age, start_age, sequence)
+            if chart.superLuck[i] != super_luck:
+                chart.superLuck[i] = super_luck
+                fixes += 1
+    return fixes
@@ -12,3 +12,16 @@ def hash_user_input(input_data: UserInput) -> str:
     # Sort keys to ensure consistent order
     json_str = json.dumps(data_dict, sort_keys=True, default=str)
     return hashlib.sha256(json_str.encode()).hexdigest()
+
+
+def generation_key(input_data: UserInput, input_hash: str) -> str:
+    """Key for sharing an in-flight generation between requests.
+
+    Requests on the server's provider pool share by input alone. A user-supplied key,
+    endpoint or model only shares with requests using the same one, so nobody gets
+    another user's "bad key" error or demo/random output.
+    """
+    if not (input_data.apiKey or input_data.apiBaseUrl or input_data.modelName):
+        return input_hash
+    endpoint = json.dumps([input_data.apiBaseUrl, input_data.apiKey, input_data.modelName])
+    return f"{input_hash}:{hashlib.sha256(endpoint.encode()).hexdigest()}"
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { UserInput, LifeDestinyResult } from './types';
+import type { UserInput, LifeDestinyResult, LifeDestinyColumnarResult, ChartColumns, KLinePoint } from './types';
 
 const api = axios.create({
   baseURL: 'http://localhost:8000/api', // Point to Python Backend
@@ -12,3 +12,28 @@ export const analyzeDestiny = async (input: UserInput): Promise<LifeDestinyResul
   const response = await api.post<LifeDestinyResult>('/analyze', input);
   return response.data;
 };
+
+const columnsToPoints = (columns: ChartColumns): KLinePoint[] =>
+  columns.age.map((age, i) => ({
+    age,
+    year: columns.year[i],
+    ganZhi: columns.ganZhi[i],
+    superLuck: columns.superLuck[i] ?? undefined,
+    open: columns.open[i],
+    close: columns.close[i],
+    high: columns.high[i],
+    low: columns.low[i],
+    score: columns.score[i],
+    reason: columns.reason[i],
+  }));
+
+// Smaller payload variant: the chart arrives as columns and is expanded client-side
+export const analyzeDestinyColumnar = async (input: UserInput): Promise<LifeDestinyResult> => {
+  const response = await api.post<LifeDestinyColumnarResult>('/analyze', input, {
+    params: { format: 'columnar' },
+  });
+  return {
+    chartData: columnsToPoints(response.data.chartColumns),
+    analysis: response.data.analysis,
+  };
+};
@@ -70,3 +70,22 @@ export interface LifeDestinyResult {
   chartData: KLinePoint[];
   analysis: AnalysisData;
 }
+
+// Columnar chart payload returned by `/api/analyze?format=columnar`
+export interface ChartColumns {
+  age: number[];
+  year: number[];
+  ganZhi: string[];
+  superLuck: (string | null)[];
+  open: number[];
+  close: number[];
+  high: number[];
+  low: number[];
+  score: number[];
+  reason: string[];
+}
+
+export interface LifeDestinyColumnarResult {
+  chartColumns: ChartColumns;
+  analysis: AnalysisData;
+}
@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+import asyncio
+import sys
+from typing import Literal, Union
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from app.models.schemas import UserInput, LifeDestinyResult
+from app.models.schemas import UserInput, LifeDestinyResult, LifeDestinyColumnarResult
 from app.services.analysis_service import generate_life_analysis, get_cached_analysis, get_db_analysis, save_analysis_async
-from app.utils.hash import hash_user_input
-from app.db.database import engine, Base, get_db
+from app.services.decode import to_columnar_result
+from app.services.executor import get_decode_stats, shutdown_executor
+from app.services.inflight import join_generation, get_generation_stats, ClientDisconnected
+from app.services.providers import get_provider_stats
+from app.services.cache_policy import get_cache_stats
+from app.services.warmup import warm_up, mark_ready, get_readiness
+from app.db.redis_ import get_redis
+from app.core.http import close_http_client
+from app.core.config import settings
+from app.core.deadline import start_deadline, DeadlineExceeded
+from app.core.server import run_production
+from app.utils.hash import hash_user_input, generation_key
+from app.db.database import engine, Base, get_read_db
 from sqlalchemy.ext.asyncio import AsyncSession
 import uvicorn
 import os
@@ -14,11 +29,29 @@ load_dotenv()
 
 app = FastAPI(title="LifeKLine API", version="1.0.0")
 
-# Create tables
+# Strong reference to the warm-up task
+_warmup_task = None
+
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    global _warmup_task
+    # Create tables only when asked; DDL on every boot slows down every worker
+    if settings.STARTUP_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    # Warm up in the background so /api/health answers at once while /api/ready waits
+    if settings.STARTUP_WARMUP:
+        _warmup_task = asyncio.create_task(warm_up())
+    else:
+        mark_ready()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if _warmup_task is not None:
+        # Still retrying a required step
+        _warmup_task.cancel()
+    shutdown_executor()
+    await close_http_client()
 
 # Enable CORS
 app.add_middleware(
@@ -29,10 +62,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/api/analyze", response_model=LifeDestinyResult)
-async def analyze_destiny(input_data: UserInput, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+def render_result(result: LifeDestinyResult, format: str):
+    if format == "columnar":
+        return to_columnar_result(result)
+    return result
+
+@app.post("/api/analyze", response_model=Union[LifeDestinyResult, LifeDestinyColumnarResult])
+async def analyze_destiny(input_data: UserInput, request: Request, background_tasks: BackgroundTasks,
+                          db: AsyncSession = Depends(get_read_db), format: Literal["rows", "columnar"] = Query("rows")):
     print(f"Analyzing for: {input_data.name}")
-    
+    deadline = start_deadline(request.headers)
+    finish_on_disconnect = (settings.GENERATION_FINISH_ON_DISCONNECT
+                            or request.headers.get("X-Finish-On-Disconnect", "").lower() in ("1", "true"))
+
     # 1. Generate Hash
     input_hash = hash_user_input(input_data)
     
@@ -40,29 +82,66 @@ async def analyze_destiny(input_data: UserInput, background_tasks: BackgroundTas
     cached_result = await get_cached_analysis(input_hash)
     if cached_result:
         print("Returning cached result from Redis")
-        return cached_result
+        return render_result(cached_result, format)
     
     # 3. Check DB
+    if deadline.expired:
+        raise HTTPException(status_code=504, detail="请求超时，请稍后重试。")
     db_result = await get_db_analysis(db, input_hash)
     if db_result:
         print("Returning result from DB")
         # Add to Redis in background
         background_tasks.add_task(save_analysis_async, input_hash, db_result)
-        return db_result
+        return render_result(db_result, format)
     
-    # 4. Generate new analysis
+    # 4. Generate new analysis (shared with concurrent requests for the same input,
+    #    cancelled upstream once every waiting client is gone)
     print("Generating new analysis")
     try:
-        result = await generate_life_analysis(input_data)
-        # 5. Save to DB and Redis in background
-        background_tasks.add_task(save_analysis_async, input_hash, result)
-        return result
+        # 5. The generation saves to DB and Redis itself when it completes
+        result = await join_generation(
+            input_hash,
+            lambda: generate_life_analysis(input_data),
+            save_analysis_async,
+            request.is_disconnected,
+            finish_on_disconnect,
+            key=generation_key(input_data, input_hash),
+        )
+        return render_result(result, format)
     except HTTPException as he:
         raise he
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="请求超时，请稍后重试。")
+    except ClientDisconnected:
+        print("Client disconnected during generation")
+        raise HTTPException(status_code=499, detail="Client Closed Request")
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "decode": get_decode_stats(),
+        "generation": get_generation_stats(),
+        "providers": get_provider_stats(),
+        "cache": await get_cache_stats(await get_redis()),
+    }
+
+@app.get("/api/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/api/ready")
+async def ready():
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    if "--prod" in sys.argv:
+        run_production("main:app")
+    else:
+        # Dev server keeps creating tables on boot; the reloader process inherits this
+        os.environ.setdefault("STARTUP_CREATE_TABLES", "true")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
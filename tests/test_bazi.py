@@ -0,0 +1,82 @@
+import unittest
+from app.models.schemas import Gender, KLinePoint
+from app.models.chart import ChartSeries
+from app.utils.bazi import (
+    JIAZI, JIAZI_INDEX, STEM_WUXING, BRANCH_WUXING, STEM_POLARITY, BRANCH_POLARITY,
+    year_gan_zhi, get_stem_polarity, is_da_yun_forward, da_yun_sequence, da_yun_steps, fix_chart_pillars,
+)
+
+
+def make_point(age, year, gan_zhi, super_luck):
+    return KLinePoint(age=age, year=year, ganZhi=gan_zhi, superLuck=super_luck,
+                      open=50, close=50, high=55, low=45, score=50, reason="平稳")
+
+
+class TestCalendarTables(unittest.TestCase):
+    def test_jiazi_table(self):
+        self.assertEqual(len(JIAZI), 60)
+        self.assertEqual(len(set(JIAZI)), 60)
+        self.assertEqual(JIAZI[0], "甲子")
+        self.assertEqual(JIAZI[-1], "癸亥")
+        self.assertEqual(JIAZI_INDEX["丙寅"], 2)
+
+    def test_year_gan_zhi(self):
+        self.assertEqual(year_gan_zhi(1984), "甲子")
+        self.assertEqual(year_gan_zhi(1990), "庚午")
+        self.assertEqual(year_gan_zhi(2024), "甲辰")
+        self.assertEqual(year_gan_zhi(2025), "乙巳")
+
+    def test_wuxing_and_polarity(self):
+        self.assertEqual(STEM_WUXING["庚"], "金")
+        self.assertEqual(BRANCH_WUXING["亥"], "水")
+        self.assertEqual(STEM_POLARITY["丙"], "YANG")
+        self.assertEqual(BRANCH_POLARITY["丑"], "YIN")
+        self.assertEqual(get_stem_polarity("乙丑"), "YIN")
+        self.assertEqual(get_stem_polarity(""), "YANG")
+
+    def test_direction(self):
+        self.assertTrue(is_da_yun_forward(Gender.MALE, "甲子"))
+        self.assertFalse(is_da_yun_forward(Gender.MALE, "乙丑"))
+        self.assertTrue(is_da_yun_forward(Gender.FEMALE, "乙丑"))
+        self.assertFalse(is_da_yun_forward(Gender.FEMALE, "甲子"))
+
+
+class TestDaYunSequence(unittest.TestCase):
+    def test_forward(self):
+        self.assertEqual(da_yun_sequence("戊申", True, 3), ("戊申", "己酉", "庚戌"))
+
+    def test_backward_wraps_around(self):
+        self.assertEqual(da_yun_sequence("乙丑", False, 4), ("乙丑", "甲子", "癸亥", "壬戌"))
+
+    def test_invalid_pillar(self):
+        with self.assertRaises(ValueError):
+            da_yun_sequence("甲丑", True)
+
+    def test_steps_cover_age_100(self):
+        self.assertEqual(da_yun_steps(1), 10)
+        self.assertEqual(da_yun_steps(8), 10)
+        self.assertEqual(da_yun_steps(100), 1)
+
+
+class TestFixChartPillars(unittest.TestCase):
+    def test_fixes_wrong_fields_in_one_pass(self):
+        points = [
+            make_point(1, 1990, "庚午", "童限"),
+            make_point(2, 1990, "庚午", "丁卯"),   # wrong year, ganZhi, and luck before start age
+            make_point(3, 1992, "壬申", "丁卯"),
+            make_point(13, 2002, "壬午", "戊辰"),  # backward sequence should give 丙寅
+        ]
+        chart = ChartSeries.from_points(points)
+        fixes = fix_chart_pillars(chart, 1990, 3, "丁卯", False)
+        self.assertEqual(fixes, 4)
+        self.assertEqual((chart[1].year, chart[1].ganZhi, chart[1].superLuck), (1991, "辛未", "童限"))
+        self.assertEqual(chart[3].superLuck, "丙寅")
+
+    def test_invalid_first_luck_keeps_super_luck(self):
+        chart = ChartSeries.from_points([make_point(5, 1994, "甲戌", "某运")])
+        self.assertEqual(fix_chart_pillars(chart, 1990, 1, "", True), 0)
+        self.assertEqual(chart.superLuck[0], "某运")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import asyncio
+import unittest
+from redis.exceptions import ResponseError
+from app.core.config import settings
+from app.core.deadline import Deadline, _current_deadline
+from app.services import analysis_service, cache_policy
+from app.services.decode import build_result, dump_cache_payload
+
+PAYLOAD = {
+    "summary": "平稳",
+    "chartPoints": [
+        {"age": 1, "year": 1990, "ganZhi": "庚午", "superLuck": "童限",
+         "open": 50, "close": 55, "high": 60, "low": 45, "score": 55, "reason": "开局平稳"}
+    ],
+}
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the cache path, with a fake clock.
+
+    `version` below 7 rejects EXPIRE NX like a real Redis 6 server.
+    """
+
+    def __init__(self, version=7):
+        self.version = version
+        self.now = 0
+        self.values = {}
+        self.expires = {}
+
+    def _purge(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.values.pop(key, None)
+            self.expires.pop(key)
+
+    def _run(self, command, key, *args):
+        self._purge(key)
+        if command == 'get':
+            return self.values.get(key)
+        if command == 'ttl':
+            if key not in self.values:
+                return -2
+            return self.expires[key] - self.now if key in self.expires else -1
+        if command == 'incr':
+            self.values[key] = int(self.values.get(key, 0)) + 1
+            return self.values[key]
+        seconds, nx = args
+        if nx and self.version < 7:
+            return ResponseError("wrong number of arguments for 'expire' command")
+        if nx and key in self.expires:
+            return False
+        self.expires[key] = self.now + seconds
+        return True
+
+    async def get(self, key):
+        return self._run('get', key)
+
+    async def ttl(self, key):
+        return self._run('ttl', key)
+
+    async def expire(self, key, seconds):
+        return self._run('expire', key, seconds, False)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def get(self, key):
+        self.commands.append(('get', key))
+
+    def ttl(self, key):
+        self.commands.append(('ttl', key))
+
+    def incr(self, key):
+        self.commands.append(('incr', key))
+
+    def expire(self, key, seconds, nx=False):
+        self.commands.append(('expire', key, seconds, nx))
+
+    async def execute(self, raise_on_error=True):
+        results = [self.redis._run(*command) for command in self.commands]
+        for result in results:
+            if raise_on_error and isinstance(result, Exception):
+                raise result
+        return results
+
+
+class TestCachePolicy(unittest.TestCase):
+    def setUp(self):
+        cache_policy._expire_nx = True
+
+    def tearDown(self):
+        cache_policy._expire_nx = True
+
+    def test_ttl_follows_popularity(self):
+        self.assertEqual(cache_policy.ttl_for(0), settings.CACHE_COLD_TTL)
+        self.assertEqual(cache_policy.ttl_for(settings.CACHE_HOT_HITS - 1), settings.CACHE_COLD_TTL)
+        self.assertEqual(cache_policy.ttl_for(settings.CACHE_HOT_HITS), settings.CACHE_HOT_TTL)
+
+    def test_only_hot_keys_past_half_life_are_extended(self):
+        hot = settings.CACHE_HOT_HITS
+        self.assertFalse(cache_policy.should_extend(1, 60))
+        self.assertFalse(cache_policy.should_extend(hot, settings.CACHE_HOT_TTL - 60))
+        self.assertTrue(cache_policy.should_extend(hot, settings.CACHE_HOT_TTL // 2 - 1))
+        # Keys without expiry are left alone
+        self.assertFalse(cache_policy.should_extend(hot, -1))
+
+    def test_stale_window(self):
+        self.assertTrue(cache_policy.is_stale(settings.CACHE_STALE_SECONDS - 1))
+        self.assertFalse(cache_policy.is_stale(settings.CACHE_STALE_SECONDS))
+        self.assertFalse(cache_policy.is_stale(-1))
+        self.assertFalse(cache_policy.is_stale(-2))
+
+    def test_hit_counter_resets_after_window(self):
+        for version in (7, 6):
+            with self.subTest(redis=version):
+                cache_policy._expire_nx = True
+                self.check_window(FakeRedis(version))
+
+    def check_window(self, redis):
+        window = settings.CACHE_ACCESS_WINDOW
+
+        async def hits(times):
+            return [await cache_policy.count_hit(redis, "abc") for _ in range(times)]
+
+        self.assertEqual(asyncio.run(hits(2)), [1, 2])
+        # Further hits do not push the window out
+        redis.now = window - 1
+        self.assertEqual(asyncio.run(hits(1)), [3])
+        redis.now = window
+        self.assertEqual(asyncio.run(hits(1)), [1])
+
+    def test_keys_do_not_collide(self):
+        self.assertNotEqual(cache_policy.cache_key("abc"), cache_policy.hits_key("abc"))
+
+
+class TestGetCachedAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.result = build_result(PAYLOAD)
+        self.redis.values[cache_policy.cache_key("h")] = dump_cache_payload(self.result)
+        self.redis.expires[cache_policy.cache_key("h")] = settings.CACHE_COLD_TTL
+        self._saved = (analysis_service.get_redis, cache_policy.count_hit, dict(cache_policy._stats),
+                       analysis_service.refresh_cached_analysis)
+
+        async def get_redis():
+            return self.redis
+        analysis_service.get_redis = get_redis
+
+    def tearDown(self):
+        analysis_service.get_redis, cache_policy.count_hit, stats, analysis_service.refresh_cached_analysis = self._saved
+        cache_policy._stats.update(stats)
+
+    def test_serves_entry_when_hit_counting_fails(self):
+        async def broken_count_hit(redis, input_hash):
+            raise ResponseError("boom")
+        cache_policy.count_hit = broken_count_hit
+
+        result = asyncio.run(analysis_service.get_cached_analysis("h"))
+        self.assertEqual(result, self.result)
+        self.assertEqual(cache_policy._stats['errors'], self._saved[2]['errors'] + 1)
+
+    def test_expired_deadline_counts_as_miss(self):
+        async def scenario():
+            _current_deadline.set(Deadline(0))
+            return await analysis_service.get_cached_analysis("h")
+
+        self.assertIsNone(asyncio.run(scenario()))
+        before = self._saved[2]
+        self.assertEqual(cache_policy._stats['deadline_exceeded'], before['deadline_exceeded'] + 1)
+        self.assertEqual(cache_policy._stats['misses'], before['misses'] + 1)
+        self.assertEqual(cache_policy._stats['errors'], before['errors'])
+
+    def test_refresh_does_not_inherit_request_deadline(self):
+        seen = []
+
+        async def refresh(input_hash):
+            seen.append(_current_deadline.get().seconds)
+        analysis_service.refresh_cached_analysis = refresh
+
+        async def scenario():
+            _current_deadline.set(Deadline(0.5))
+            analysis_service.schedule_refresh("h")
+            await asyncio.gather(*analysis_service._refresh_tasks)
+
+        asyncio.run(scenario())
+        self.assertEqual(seen, [settings.DB_TIMEOUT])
+
+    def test_miss_leaves_no_counter(self):
+        self.assertIsNone(asyncio.run(analysis_service.get_cached_analysis("unknown")))
+        self.assertNotIn(cache_policy.hits_key("unknown"), self.redis.values)
+
+
+if __name__ == "__main__":
+    unittest.main()
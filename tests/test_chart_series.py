@@ -0,0 +1,67 @@
+import unittest
+import json
+import pickle
+from app.models.chart import ChartSeries
+from app.models.schemas import KLinePoint, ChartColumns, LifeDestinyResult
+
+
+def make_point(age, reason="平稳"):
+    return {
+        "age": age, "year": 1989 + age, "ganZhi": "甲子", "superLuck": None if age < 5 else "丙寅",
+        "open": 50, "close": 55.5, "high": 60, "low": 45, "score": 55.5, "reason": reason,
+    }
+
+
+class TestChartSeries(unittest.TestCase):
+    def test_round_trip_points(self):
+        points = [make_point(age) for age in range(1, 11)]
+        series = ChartSeries.from_points(points)
+        self.assertEqual(len(series), 10)
+        rows = series.to_points()
+        self.assertIsInstance(rows[0], KLinePoint)
+        self.assertEqual([p.model_dump() for p in rows], [KLinePoint(**p).model_dump() for p in points])
+
+    def test_round_trip_columns(self):
+        series = ChartSeries.from_points([make_point(age) for age in range(1, 6)])
+        columns = series.to_columns()
+        restored = ChartSeries.from_columns(columns.model_dump())
+        self.assertEqual(restored.to_columns().model_dump(), columns.model_dump())
+
+    def test_strings_are_shared(self):
+        series = ChartSeries.from_points([make_point(1, "".join(["平", "稳"])), make_point(2, "".join(["平", "稳"]))])
+        self.assertIs(series.reason[0], series.reason[1])
+
+    def test_rejects_ragged_columns(self):
+        columns = ChartSeries.from_points([make_point(1), make_point(2)]).to_columns().model_dump()
+        columns["reason"] = columns["reason"][:1]
+        with self.assertRaises(ValueError):
+            ChartColumns(**columns)
+
+
+ANALYSIS = {
+    "bazi": [], "summary": "", "summaryScore": 5, "personality": "", "personalityScore": 5,
+    "industry": "", "industryScore": 5, "geomancy": "", "geomancyScore": 5, "wealth": "", "wealthScore": 5,
+    "marriage": "", "marriageScore": 5, "health": "", "healthScore": 5, "family": "", "familyScore": 5,
+    "crypto": "", "cryptoScore": 5, "cryptoYear": "", "cryptoStyle": "",
+}
+
+
+class TestResultChartData(unittest.TestCase):
+    def test_result_keeps_columns_and_serializes_rows(self):
+        points = [make_point(age) for age in range(1, 4)]
+        result = LifeDestinyResult(chartData=points, analysis=ANALYSIS)
+        self.assertIsInstance(result.chartData, ChartSeries)
+        self.assertIsInstance(result.chartData[0], KLinePoint)
+        self.assertEqual(json.loads(result.model_dump_json())["chartData"],
+                         [KLinePoint(**p).model_dump() for p in points])
+        # Round-trips through its own serialized form and through pickle (process pool)
+        self.assertEqual(LifeDestinyResult(**result.model_dump(mode="json")), result)
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+
+    def test_schema_still_describes_rows(self):
+        schema = LifeDestinyResult.model_json_schema()
+        self.assertEqual(schema["properties"]["chartData"]["type"], "array")
+
+
+if __name__ == "__main__":
+    unittest.main()
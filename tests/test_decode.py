@@ -0,0 +1,74 @@
+import asyncio
+import json
+import unittest
+from app.core.config import settings
+from app.services.decode import extract_json_content, parse_completion_body, decode_cache_payload, dump_cache_payload
+from app.services.executor import byte_size, run_decode, get_decode_stats, shutdown_executor
+
+
+def make_payload():
+    return {
+        "bazi": ["甲子", "丙寅", "戊辰", "壬戌"],
+        "summary": "平稳",
+        "chartPoints": [
+            {"age": age, "year": 1989 + age, "ganZhi": "甲子", "superLuck": "童限",
+             "open": 50, "close": 52, "high": 55, "low": 48, "score": 52, "reason": "平稳"}
+            for age in range(1, 101)
+        ],
+    }
+
+
+def make_body(content):
+    return json.dumps({"choices": [{"message": {"content": content}}]})
+
+
+class TestDecode(unittest.TestCase):
+    def test_extracts_markdown_block(self):
+        content = "说明\n```json\n{\"a\": 1}\n```\n结束"
+        self.assertEqual(extract_json_content(content), '{"a": 1}')
+
+    def test_extracts_bare_object(self):
+        self.assertEqual(extract_json_content('好的 {"a": {"b": 2}} 完'), '{"a": {"b": 2}}')
+
+    def test_parse_completion_body(self):
+        result = parse_completion_body(make_body(json.dumps(make_payload(), ensure_ascii=False)))
+        self.assertEqual(len(result.chartData), 100)
+        self.assertEqual(result.analysis.summary, "平稳")
+        self.assertEqual(result.analysis.wealth, "无")
+
+    def test_missing_chart_points(self):
+        with self.assertRaises(ValueError):
+            parse_completion_body(make_body('{"summary": "x"}'))
+
+    def test_cache_payload_round_trip(self):
+        result = parse_completion_body(make_body(json.dumps(make_payload())))
+        self.assertEqual(decode_cache_payload(dump_cache_payload(result)), result)
+        # Row-format entries written before the columnar layout still decode
+        self.assertEqual(decode_cache_payload(result.model_dump_json()), result)
+
+
+class TestRunDecode(unittest.TestCase):
+    def tearDown(self):
+        shutdown_executor()
+
+    def test_small_payload_stays_inline(self):
+        before = get_decode_stats()
+        self.assertEqual(asyncio.run(run_decode(len, "abc", size=3)), 3)
+        after = get_decode_stats()
+        self.assertEqual(after["inline"], before["inline"] + 1)
+        self.assertEqual(after["offloaded"], before["offloaded"])
+
+    def test_size_is_measured_in_bytes(self):
+        self.assertEqual(byte_size("甲子"), 6)
+        self.assertEqual(byte_size(b"abc"), 3)
+
+    def test_large_payload_is_offloaded(self):
+        body = make_body(json.dumps(make_payload()))
+        before = get_decode_stats()
+        result = asyncio.run(run_decode(parse_completion_body, body, size=settings.DECODE_INLINE_THRESHOLD))
+        self.assertEqual(len(result.chartData), 100)
+        self.assertEqual(get_decode_stats()["offloaded"], before["offloaded"] + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from app.models.schemas import UserInput
+from app.utils.hash import generation_key, hash_user_input
+
+BASE = dict(gender="Male", birthYear=1990, yearPillar="庚午", monthPillar="戊寅", dayPillar="甲子",
+            hourPillar="丙寅", startAge=3, firstDaYun="己卯")
+
+
+class TestGenerationKey(unittest.TestCase):
+    def key(self, **extra):
+        input_data = UserInput(**BASE, **extra)
+        return generation_key(input_data, hash_user_input(input_data))
+
+    def test_server_pool_requests_share(self):
+        self.assertEqual(self.key(), hash_user_input(UserInput(**BASE)))
+
+    def test_user_endpoints_are_kept_apart(self):
+        self.assertNotEqual(self.key(apiKey="a"), self.key())
+        self.assertNotEqual(self.key(apiKey="a"), self.key(apiKey="b"))
+        self.assertNotEqual(self.key(apiKey="demo"), self.key(apiKey="random"))
+        self.assertEqual(self.key(apiKey="a"), self.key(apiKey="a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+from app.services import inflight
+from app.core.deadline import Deadline, DeadlineExceeded, _current_deadline, with_deadline
+from app.services.inflight import join_generation, ClientDisconnected
+
+
+class TestJoinGeneration(unittest.TestCase):
+    def setUp(self):
+        self._poll_interval = inflight.DISCONNECT_POLL_INTERVAL
+        inflight.DISCONNECT_POLL_INTERVAL = 0.01
+        self.calls = 0
+        self.saved = []
+
+    def tearDown(self):
+        inflight.DISCONNECT_POLL_INTERVAL = self._poll_interval
+
+    async def save(self, input_hash, result):
+        self.saved.append((input_hash, result))
+
+    def make_generate(self, delay, result="ok"):
+        async def generate():
+            self.calls += 1
+            await asyncio.sleep(delay)
+            return result
+        return generate
+
+    @staticmethod
+    def disconnected_after(seconds):
+        loop = asyncio.get_running_loop()
+        gone_at = loop.time() + seconds
+
+        async def is_disconnected():
+            return loop.time() >= gone_at
+        return is_disconnected
+
+    @staticmethod
+    async def connected():
+        return False
+
+    def test_concurrent_requests_share_one_generation(self):
+        async def scenario():
+            generate = self.make_generate(0.05)
+            results = await asyncio.gather(
+                join_generation("h1", generate, self.save, self.connected),
+                join_generation("h1", generate, self.save, self.connected),
+            )
+            await asyncio.sleep(0)
+            return results
+
+        self.assertEqual(asyncio.run(scenario()), ["ok", "ok"])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.saved, [("h1", "ok")])
+
+    def test_different_keys_do_not_share(self):
+        async def scenario():
+            return await asyncio.gather(
+                join_generation("h7", self.make_generate(0.02, "pool"), self.save, self.connected),
+                join_generation("h7", self.make_generate(0.02, "own key"), self.save, self.connected,
+                                key="h7:user"),
+            )
+
+        self.assertEqual(asyncio.run(scenario()), ["pool", "own key"])
+        self.assertEqual(self.calls, 2)
+
+    def test_cancels_when_last_waiter_disconnects(self):
+        async def scenario():
+            task_ref = {}
+
+            async def generate():
+                task_ref["task"] = asyncio.current_task()
+                await asyncio.sleep(10)
+
+            with self.assertRaises(ClientDisconnected):
+                await join_generation("h2", generate, self.save, self.disconnected_after(0.02))
+            await asyncio.sleep(0)
+            return task_ref["task"]
+
+        task = asyncio.run(scenario())
+        self.assertTrue(task.cancelled())
+        self.assertEqual(self.saved, [])
+
+    def test_request_after_cancel_starts_fresh_generation(self):
+        async def scenario():
+            with self.assertRaises(ClientDisconnected):
+                await join_generation("h6", self.make_generate(10), self.save, self.disconnected_after(0.02))
+            # No loop turn in between: the cancelled task has not run its callbacks yet
+            return await join_generation("h6", self.make_generate(0.01, "fresh"), self.save, self.connected)
+
+        self.assertEqual(asyncio.run(scenario()), "fresh")
+        self.assertEqual(self.calls, 2)
+
+    def test_other_waiter_keeps_generation_alive(self):
+        async def scenario():
+            generate = self.make_generate(0.1)
+            leaver = join_generation("h3", generate, self.save, self.disconnected_after(0.02))
+            stayer = join_generation("h3", generate, self.save, self.connected)
+            return await asyncio.gather(leaver, stayer, return_exceptions=True)
+
+        left, stayed = asyncio.run(scenario())
+        self.assertIsInstance(left, ClientDisconnected)
+        self.assertEqual(stayed, "ok")
+
+    def test_finish_on_disconnect_caches_result(self):
+        async def scenario():
+            with self.assertRaises(ClientDisconnected):
+                await join_generation("h4", self.make_generate(0.05), self.save,
+                                      self.disconnected_after(0.01), finish_on_disconnect=True)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        self.assertEqual(self.saved, [("h4", "ok")])
+
+    def test_waiters_keep_their_own_deadlines(self):
+        async def generate():
+            # Would raise DeadlineExceeded if the task inherited the first waiter's budget
+            return await with_deadline(asyncio.sleep(0.1, result="ok"))
+
+        async def waiter(seconds):
+            _current_deadline.set(Deadline(seconds))
+            return await join_generation("h5", generate, self.save, self.connected,
+                                         finish_on_disconnect=True)
+
+        async def scenario():
+            # Each waiter runs in its own task, like separate requests
+            short = asyncio.create_task(waiter(0.02))
+            await asyncio.sleep(0)
+            long = asyncio.create_task(waiter(5))
+            return await asyncio.gather(short, long, return_exceptions=True)
+
+        short, long = asyncio.run(scenario())
+        self.assertIsInstance(short, DeadlineExceeded)
+        self.assertEqual(long, "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import unittest
+import httpx
+from app.core import http
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded, _current_deadline
+from app.services import providers
+from app.services.llm import hedged_completion
+from app.services.providers import ProviderConfig, ProviderStats
+
+PAYLOAD = json.dumps({
+    "summary": "平稳",
+    "chartPoints": [
+        {"age": 1, "year": 1990, "ganZhi": "庚午", "superLuck": "童限",
+         "open": 50, "close": 55, "high": 60, "low": 45, "score": 55, "reason": "开局平稳"}
+    ],
+}, ensure_ascii=False)
+
+
+def sse_body(delay_before_first_token):
+    async def chunks():
+        await asyncio.sleep(delay_before_first_token)
+        for i in range(0, len(PAYLOAD), 40):
+            delta = {"choices": [{"delta": {"content": PAYLOAD[i:i + 40]}}]}
+            yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+    return chunks()
+
+
+class TestHedgedCompletion(unittest.TestCase):
+    def setUp(self):
+        self._settings = (settings.HEDGE_DELAY_SECONDS, settings.HEDGE_DELAY_MIN_SECONDS)
+        settings.HEDGE_DELAY_SECONDS = 0.05
+        settings.HEDGE_DELAY_MIN_SECONDS = 0.01
+        providers._stats.clear()
+        self.calls = []
+        self.pool = [
+            ProviderConfig(name="slow", base_url="http://slow.test/v1", model="m1", api_key="k"),
+            ProviderConfig(name="fast", base_url="http://fast.test/v1", model="m2", api_key="k"),
+        ]
+
+    def tearDown(self):
+        settings.HEDGE_DELAY_SECONDS, settings.HEDGE_DELAY_MIN_SECONDS = self._settings
+        providers._stats.clear()
+        http._client = None
+
+    def run_with(self, handler, deadline=None):
+        async def scenario():
+            if deadline is not None:
+                _current_deadline.set(Deadline(deadline))
+            http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await hedged_completion(self.pool, [{"role": "user", "content": "hi"}])
+            finally:
+                await http.close_http_client()
+        return asyncio.run(scenario())
+
+    def test_hedges_to_secondary_when_primary_is_slow(self):
+        async def handler(request):
+            self.calls.append(request.url.host)
+            delay = 5 if request.url.host == "slow.test" else 0
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse_body(delay))
+
+        result = self.run_with(handler)
+        self.assertEqual(result.analysis.summary, "平稳")
+        self.assertEqual(self.calls, ["slow.test", "fast.test"])
+        stats = providers.get_provider_stats()
+        self.assertEqual(stats["slow:m1"]["hedged"], 1)
+        self.assertEqual(stats["fast:m2"]["successes"], 1)
+        self.assertIsNotNone(stats["fast:m2"]["first_token_srtt"])
+
+    def test_slow_provider_hedge_delay_rises_after_losing_hedges(self):
+        async def handler(request):
+            delay = 5 if request.url.host == "slow.test" else 0
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse_body(delay))
+
+        # Lower bounds only correct an existing estimate
+        providers.get_stats(self.pool[0]).record_first_token(0.02)
+        delays = [providers.get_stats(self.pool[0]).hedge_delay()]
+        for _ in range(3):
+            self.run_with(handler)
+            delays.append(providers.get_stats(self.pool[0]).hedge_delay())
+        self.assertEqual(delays, sorted(set(delays)))
+        stats = providers.get_provider_stats()["slow:m1"]
+        self.assertEqual(stats["hedged"], 3)
+        self.assertEqual(stats["failures"], 0)
+
+    def test_deadline_is_not_a_provider_failure(self):
+        async def handler(request):
+            self.calls.append(request.url.host)
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse_body(5))
+
+        with self.assertRaises(DeadlineExceeded):
+            self.run_with(handler, deadline=0.02)
+        self.assertEqual(self.calls, ["slow.test"])
+        self.assertEqual(providers.get_provider_stats()["slow:m1"]["failures"], 0)
+
+    def test_falls_back_when_primary_fails(self):
+        async def handler(request):
+            self.calls.append(request.url.host)
+            if request.url.host == "slow.test":
+                return httpx.Response(500, text="boom")
+            body = json.dumps({"choices": [{"message": {"content": PAYLOAD}}]})
+            return httpx.Response(200, headers={"content-type": "application/json"}, text=body)
+
+        result = self.run_with(handler)
+        self.assertEqual(len(result.chartData), 1)
+        stats = providers.get_provider_stats()["slow:m1"]
+        self.assertEqual(stats["failures"], 1)
+        # An HTTP error is not a latency observation
+        self.assertIsNone(stats["first_token_srtt"])
+
+    def test_raises_last_error_when_all_fail(self):
+        async def handler(request):
+            return httpx.Response(500, text="boom")
+
+        with self.assertRaises(Exception):
+            self.run_with(handler)
+
+
+class TestProviderStats(unittest.TestCase):
+    def test_hedge_delay_adapts_to_latency(self):
+        stats = ProviderStats()
+        self.assertEqual(stats.hedge_delay(), settings.HEDGE_DELAY_SECONDS)
+        for _ in range(50):
+            stats.record_first_token(4.0)
+        self.assertAlmostEqual(stats.hedge_delay(), 4.0, delta=0.5)
+        for _ in range(50):
+            stats.record_first_token(1000.0)
+        self.assertEqual(stats.hedge_delay(), settings.HEDGE_DELAY_MAX_SECONDS)
+
+    def test_lower_bound_only_raises_the_estimate(self):
+        stats = ProviderStats()
+        stats.record_lower_bound(0.05)
+        self.assertIsNone(stats.srtt)
+        self.assertEqual(stats.hedge_delay(), settings.HEDGE_DELAY_SECONDS)
+        stats.record_first_token(4.0)
+        stats.record_lower_bound(1.0)
+        self.assertEqual(stats.srtt, 4.0)
+        stats.record_lower_bound(10.0)
+        self.assertGreater(stats.srtt, 4.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
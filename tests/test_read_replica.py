@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from app.db import database
+from app.services import analysis_service
+from app.services.decode import build_result, dump_cache_payload
+
+PAYLOAD = {
+    "summary": "平稳",
+    "chartPoints": [
+        {"age": 1, "year": 1990, "ganZhi": "庚午", "superLuck": "童限",
+         "open": 50, "close": 55, "high": 60, "low": 45, "score": 55, "reason": "开局平稳"}
+    ],
+}
+
+
+class FakeResult:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self.raw
+
+
+class FakeSession:
+    """Stands in for an AsyncSession bound to `bind`; `execute` returns `raw` or raises `error`."""
+
+    def __init__(self, bind, raw=None, error=None):
+        self.bind = bind
+        self.raw = raw
+        self.error = error
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append(params)
+        if self.error is not None:
+            raise self.error
+        return FakeResult(self.raw)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class TestReplicaFallback(unittest.TestCase):
+    def setUp(self):
+        self._saved = (database.read_engine, analysis_service.AsyncSessionLocal)
+        self.result = build_result(PAYLOAD)
+        self.replica_engine = object()
+        # Pretend a replica is configured
+        database.read_engine = self.replica_engine
+        self.primary = FakeSession(database.engine, raw=dump_cache_payload(self.result))
+        analysis_service.AsyncSessionLocal = lambda: self.primary
+
+    def tearDown(self):
+        database.read_engine, analysis_service.AsyncSessionLocal = self._saved
+
+    def test_replica_error_falls_back_to_primary(self):
+        replica = FakeSession(self.replica_engine, error=ConnectionError("replica down"))
+        self.assertTrue(database.is_replica_session(replica))
+
+        result = asyncio.run(analysis_service.get_db_analysis(replica, "h"))
+        self.assertEqual(result, self.result)
+        self.assertEqual(replica.executed, [{"input_hash": "h"}])
+        self.assertEqual(self.primary.executed, [{"input_hash": "h"}])
+
+    def test_primary_error_does_not_retry(self):
+        session = FakeSession(database.engine, error=ConnectionError("db down"))
+        self.assertFalse(database.is_replica_session(session))
+
+        self.assertIsNone(asyncio.run(analysis_service.get_db_analysis(session, "h")))
+        self.assertEqual(self.primary.executed, [])
+
+    def test_no_replica_configured(self):
+        database.read_engine = database.engine
+        self.assertFalse(database.is_replica_session(FakeSession(database.engine)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+from app.core.config import settings
+from app.services import warmup
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self._saved = (dict(warmup.STEPS), warmup.RETRY_SECONDS, settings.WARMUP_REQUIRED_STEPS)
+        warmup.RETRY_SECONDS = 0.01
+        settings.WARMUP_REQUIRED_STEPS = "db"
+        warmup._state.update(ready=False, steps={})
+        self.db_failures = 2
+
+        async def flaky_db():
+            if self.db_failures:
+                self.db_failures -= 1
+                raise ConnectionError("db down")
+
+        async def broken_http():
+            raise ConnectionError("upstream down")
+
+        warmup.STEPS.clear()
+        warmup.STEPS.update(db=flaky_db, http=broken_http)
+
+    def tearDown(self):
+        steps, warmup.RETRY_SECONDS, settings.WARMUP_REQUIRED_STEPS = self._saved
+        warmup.STEPS.clear()
+        warmup.STEPS.update(steps)
+        warmup._state.update(ready=False, steps={})
+
+    def test_not_ready_until_required_steps_succeed(self):
+        async def scenario():
+            task = asyncio.create_task(warmup.warm_up())
+            await asyncio.sleep(0.005)
+            self.assertFalse(warmup.get_readiness()['ready'])
+            await task
+
+        asyncio.run(scenario())
+        readiness = warmup.get_readiness()
+        self.assertTrue(readiness['ready'])
+        self.assertEqual(readiness['steps']['db']['attempts'], 3)
+        # Optional steps are not retried and do not block readiness
+        self.assertFalse(readiness['steps']['http']['ok'])
+        self.assertEqual(readiness['steps']['http']['attempts'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()